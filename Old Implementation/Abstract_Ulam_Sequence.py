@@ -1,6 +1,10 @@
-from math import ceil
+import os, re, struct, sys, time
+from array import array
 from bisect import bisect_left
 from bisect import bisect_right
+from functools import reduce
+from itertools import accumulate, chain
+from operator import attrgetter, itemgetter
 from shutil import copyfile
 
 INFINITY = float("inf")
@@ -9,12 +13,27 @@ INFINITY = float("inf")
 UPDATE_BOUND = INFINITY
 
 class NonStandardInteger():
-    """Non-standard integer a*n + b of a non-standard ring."""
+    """Non-standard integer a*n + b.
 
-    def __init__(self, a, b, ring):
-        self.non_st_part = a
-        self.st_part = b
-        self.non_st_ring = ring
+    Values are immutable and carry no ring: comparisons report what they need for standardization
+    to the active ring, see NonStandardRing.activate. Values are interned by (a, b), so the many
+    equal endpoints of sequences share one object."""
+
+    __slots__ = ('non_st_part', 'st_part')
+
+    def __new__(cls, a, b):
+        key = (a, b)
+        x = interned.get(key)
+        if x is None:
+            x = object.__new__(cls)
+            object.__setattr__(x, 'non_st_part', a)
+            object.__setattr__(x, 'st_part', b)
+            if len(interned) < MAX_INTERNED:
+                interned[key] = x
+        return x
+
+    def __setattr__(self, name, value):
+        raise AttributeError("non-standard integers are immutable, they are shared between sequences")
 
     def __repr__(self):
         return str((self.non_st_part, self.st_part))
@@ -32,7 +51,7 @@ class NonStandardInteger():
 
         #Finds any n for which conclusion of a + bn = c + dn is different
         if (c - a) % (b - d) == 0:
-            self.non_st_ring.update_exclusions((c - a)/(b - d))
+            active_ring.update_exclusions((c - a)//(b - d))
 
         return False
 
@@ -49,13 +68,17 @@ class NonStandardInteger():
         if b == d:
             return a < c
 
-        #Finds smallest n such that a + bn < c + dn.
-        guess = ceil(float(c - a)/float(b - d))
+        #Finds smallest n such that a + bn < c + dn; only a guess above the ring's threshold can change anything.
+        ring = active_ring
+        diff = b - d
+        bound = ring.guess_threshold * diff
+        if (c - a > bound) if diff > 0 else (c - a < bound):
+            guess = -((a - c)//diff) #exact ceil((c - a)/diff)
 
-        if guess > UPDATE_BOUND:
-            print (self,other,guess)
+            if guess > UPDATE_BOUND:
+                print (self,other,guess)
 
-        self.non_st_ring.update_guess(guess)
+            ring.update_guess(guess)
 
         return b < d
 
@@ -81,13 +104,17 @@ class NonStandardInteger():
         if b == d:
             return a <= c
 
-        #Finds smallest n such that a + bn <= c + dn.
-        guess = ceil(float(c - a)/float(b - d))
+        #Finds smallest n such that a + bn <= c + dn; only a guess above the ring's threshold can change anything.
+        ring = active_ring
+        diff = b - d
+        bound = ring.guess_threshold * diff
+        if (c - a > bound) if diff > 0 else (c - a < bound):
+            guess = -((a - c)//diff) #exact ceil((c - a)/diff)
 
-        if guess > UPDATE_BOUND:
-            print (self,other,guess)
+            if guess > UPDATE_BOUND:
+                print (self,other,guess)
 
-        self.non_st_ring.update_guess(guess)
+            ring.update_guess(guess)
 
         return b < d
 
@@ -101,13 +128,17 @@ class NonStandardInteger():
         if b == d:
             return a < c
 
-        #Finds smallest n such that a + bn < c + dn.
-        guess = ceil(float(c - a)/float(b - d))
+        #Finds smallest n such that a + bn < c + dn; only a guess above the ring's threshold can change anything.
+        ring = active_ring
+        diff = b - d
+        bound = ring.guess_threshold * diff
+        if (c - a > bound) if diff > 0 else (c - a < bound):
+            guess = -((a - c)//diff) #exact ceil((c - a)/diff)
 
-        if guess > UPDATE_BOUND:
-            print (self,other,guess)
+            if guess > UPDATE_BOUND:
+                print (self,other,guess)
 
-        self.non_st_ring.update_guess(guess)
+            ring.update_guess(guess)
 
         return b < d
 
@@ -121,61 +152,108 @@ class NonStandardInteger():
         if b == d:
             return a <= c
 
-        #Finds smallest n such that a + bn <= c + dn.
-        guess = ceil(float(c - a)/float(b - d))
+        #Finds smallest n such that a + bn <= c + dn; only a guess above the ring's threshold can change anything.
+        ring = active_ring
+        diff = b - d
+        bound = ring.guess_threshold * diff
+        if (c - a > bound) if diff > 0 else (c - a < bound):
+            guess = -((a - c)//diff) #exact ceil((c - a)/diff)
 
-        if guess > UPDATE_BOUND:
-            print (self,other,guess)
+            if guess > UPDATE_BOUND:
+                print (self,other,guess)
 
-        self.non_st_ring.update_guess(guess)
+            ring.update_guess(guess)
 
         return b < d
 
     def next(self, n = 1):
         """Returns the next non-standard integer n away."""
-        return NonStandardInteger(self.non_st_part, self.st_part + n, self.non_st_ring)
+        return NonStandardInteger(self.non_st_part, self.st_part + n)
 
     def previous(self, n = 1):
         """Returns the previous non-standard integer n away."""
-        return NonStandardInteger(self.non_st_part, self.st_part - n, self.non_st_ring)
+        return NonStandardInteger(self.non_st_part, self.st_part - n)
 
     def __add__(self, other):
-        return NonStandardInteger(self.non_st_part + other.non_st_part, self.st_part + other.st_part, self.non_st_ring)
+        return NonStandardInteger(self.non_st_part + other.non_st_part, self.st_part + other.st_part)
 
     def __sub__(self, other):
-        return NonStandardInteger(self.non_st_part - other.non_st_part, self.st_part - other.st_part, self.non_st_ring)
+        return NonStandardInteger(self.non_st_part - other.non_st_part, self.st_part - other.st_part)
 
     def __rmul__(self, other):
         """"Used to scale a non-standard integer by an integer."""
-        return NonStandardInteger(self.non_st_part * other, self.st_part * other, self.non_st_ring)
+        return NonStandardInteger(self.non_st_part * other, self.st_part * other)
+
+
+#Interned values, keyed by (a, b). Parts are bounded by the coefficients computed, so this stays small.
+interned = {}
+MAX_INTERNED = 1 << 16 # values past this are still correct, just not shared
+
+#Ring that comparisons report to.
+active_ring = None
 
 
 class NonStandardRing():
-    """Class to keep track of results of inequalities of non-standard integers."""
-    def __init__(self):
+    """Class to keep track of results of inequalities of non-standard integers.
+
+    Comparisons of non-standard integers report to the active ring. activate() makes a ring active,
+    and a ring used in a with statement is active inside it."""
+    def __init__(self, batched = True):
         self.minimal_guess = 1 #guesses minimal n needed to make all inequalities <, > valid.
-        self.exclusions_set = set([]) #keeps track of all n that make != inequalities work.
+        self.exclusions = [] #keeps track of all n that make != inequalities work, sorted and without repeats.
+        self.previous_ring = None
+
+        #Batched mode: a comparison computes and reports its guess only when the guess would be above
+        #guess_threshold, the smaller of minimal_guess and UPDATE_BOUND, which is tested with one integer product.
+        #Without batching every comparison reports its guess.
+        self.batched = batched
+        self.set_guess_threshold()
 
     def __repr__(self):
         return("Nonstandard Ring Z[N]; standardized for " + self.print_all_exclusions())
 
+    def activate(self):
+        global active_ring
+        active_ring = self
+
+    def __enter__(self):
+        self.previous_ring = active_ring
+        self.activate()
+        return self
+
+    def __exit__(self, *exc_info):
+        global active_ring
+        active_ring = self.previous_ring
+
+    def set_guess_threshold(self):
+        if self.batched:
+            self.guess_threshold = min(self.minimal_guess, UPDATE_BOUND)
+        else:
+            self.guess_threshold = -INFINITY
+
     def update_guess(self, guess):
         self.minimal_guess = max(int(guess), self.minimal_guess)
+        self.set_guess_threshold()
 
     def update_exclusions(self, exclusion):
-        self.exclusions_set.add(exclusion)
+        #minimal_guess only grows until the next reset, so exclusions at or below it never get printed
+        if exclusion <= self.minimal_guess:
+            return
+        ex_list = self.exclusions
+        i = bisect_left(ex_list, exclusion)
+        if i == len(ex_list) or ex_list[i] != exclusion:
+            ex_list.insert(i, exclusion)
 
     def reset_all_exclusions(self):
         self.minimal_guess = 4
-        self.exclusions_set = set([])
+        self.exclusions = []
+        self.set_guess_threshold()
 
     def print_all_exclusions(self):
         """Prints a string describing all obstacles to standardization."""
-        ex_list = list(self.exclusions_set)
-        list.sort(ex_list)
-        i = bisect_right(ex_list,self.minimal_guess)
-        ex_list = ex_list[i:]
-        self.exclusions_set = set(ex_list)
+        i = bisect_right(self.exclusions,self.minimal_guess)
+        ex_list = self.exclusions[i:]
+        self.exclusions = ex_list
 
         if len(ex_list) == 0:
             return "N >= " + str(self.minimal_guess)
@@ -339,7 +417,16 @@ class ArithmeticSequence:
         return ArithmeticSequence(self.final.next(), self.final.next())
 
 class DisjointSequences:
-    """Container of disjoint arithmetic sequences, kept in order."""
+    """Container of disjoint arithmetic sequences, kept in order.
+
+    The sequences are stored in blocks of at most 2*BLOCK_SIZE, like a two level B-tree. Blocks are never
+    changed once built, so shuffle_in, cut_out and select_larger_than return new containers that share every
+    block they do not touch: each costs O(BLOCK_SIZE + n/BLOCK_SIZE) list copying plus a binary search.
+    The binary searches probe the same positions as bisect on a flat list, so the same non-standard
+    comparisons, and hence the same standardization, are made."""
+
+    BLOCK_SIZE = 256
+
     def __init__(self, disjoint_seq_list, check_disjoint = True, presorted = False):
 
         #If the list of disjoint sequences isn't already sorted, start by sorting it.
@@ -357,7 +444,131 @@ class DisjointSequences:
                     if seq1.intersects(seq2):
                         raise ValueError("Inputs must be disjoint sequences.")
 
-        self.sequence_list = disjoint_seq_list
+        self.set_blocks(split_into_blocks(list(disjoint_seq_list), self.BLOCK_SIZE))
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Container on the given blocks, which must be non-empty and in order."""
+        ds = cls.__new__(cls)
+        ds.set_blocks(blocks)
+        return ds
+
+    def set_blocks(self, blocks):
+        self.blocks = blocks
+
+        #starts[k] is the index of the first sequence of block k
+        if len(blocks) > 1:
+            self.starts = list(accumulate(map(len, blocks), initial=0))
+            self.size = self.starts.pop()
+        else:
+            self.starts = [0]
+            self.size = len(blocks[0]) if blocks else 0
+
+    @property
+    def sequence_list(self):
+        """All sequences as a new list."""
+        return list(chain.from_iterable(self.blocks))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return chain.from_iterable(self.blocks)
+
+    def __getitem__(self, i):
+        if len(self.blocks) == 1:
+            return self.blocks[0][i]
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError("sequence index out of range")
+        k = bisect_right(self.starts, i) - 1
+        return self.blocks[k][i - self.starts[k]]
+
+    def append(self, seq):
+        """Adds seq after every sequence, changing this container."""
+        if self.size and len(self.blocks[-1]) < 2*self.BLOCK_SIZE:
+            self.blocks = self.blocks[:-1] + [self.blocks[-1] + [seq]]
+            self.size += 1
+        else:
+            self.set_blocks(self.blocks + [[seq]])
+
+    def replace(self, i, j, seqs):
+        """Returns a new container with sequences i to j - 1 replaced by seqs; blocks outside that range are shared."""
+        blocks = self.blocks
+        starts = self.starts
+        if i == j and not seqs:
+            return DisjointSequences.from_blocks(blocks)
+        if len(blocks) <= 1:
+            middle = blocks[0][:i] + seqs + blocks[0][j:] if blocks else seqs
+            if len(middle) <= 2*self.BLOCK_SIZE:
+                return DisjointSequences.from_blocks([middle] if middle else [])
+            return DisjointSequences.from_blocks(split_into_blocks(middle, self.BLOCK_SIZE))
+
+        #blocks ki to kj hold the replaced range and the positions next to it
+        ki = max(bisect_right(starts, i) - 1, 0)
+        kj = max(bisect_right(starts, j) - 1, ki)
+        middle = blocks[ki][:i - starts[ki]] + seqs + blocks[kj][j - starts[kj]:]
+
+        #absorb a neighbour rather than leave a small block behind
+        if len(middle) < self.BLOCK_SIZE // 2:
+            if ki > 0:
+                ki -= 1
+                middle = blocks[ki] + middle
+            elif kj < len(blocks) - 1:
+                kj += 1
+                middle = middle + blocks[kj]
+
+        return DisjointSequences.from_blocks(blocks[:ki] + split_into_blocks(middle, self.BLOCK_SIZE) + blocks[kj + 1:])
+
+    def sequences(self, i, j):
+        """Sequences i to j - 1 as a new list."""
+        blocks = self.blocks
+        if len(blocks) == 1:
+            return blocks[0][i:j]
+        seq_list = []
+        k = bisect_right(self.starts, i) - 1
+        while i < j:
+            start = self.starts[k]
+            block = blocks[k]
+            seq_list.extend(block[i - start:j - start])
+            i = start + len(block)
+            k += 1
+        return seq_list
+
+    def bisect_final(self, x, lo = 0, hi = None):
+        """bisect_left on the list of final elements."""
+        if hi is None:
+            hi = self.size
+        blocks = self.blocks
+        starts = self.starts
+        if len(blocks) == 1:
+            return bisect_left(blocks[0], x, lo, hi, key=final_element)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = bisect_right(starts, mid) - 1
+            if blocks[k][mid - starts[k]].final < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_initial(self, x, lo = 0, hi = None):
+        """bisect_right on the list of initial elements."""
+        if hi is None:
+            hi = self.size
+        blocks = self.blocks
+        starts = self.starts
+        if len(blocks) == 1:
+            return bisect_right(blocks[0], x, lo, hi, key=initial_element)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = bisect_right(starts, mid) - 1
+            if x < blocks[k][mid - starts[k]].initial:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
 
     def __repr__(self):
         return("Increasing sequences: " + str(self.sequence_list))
@@ -366,7 +577,7 @@ class DisjointSequences:
         """Gives a more easily readable print-out of the coefficients."""
         formal_list = []
 
-        for seq in self.sequence_list:
+        for seq in self:
             a = seq.initial
             b = seq.final
 
@@ -381,7 +592,7 @@ class DisjointSequences:
         """Gives print-out that is easy to compare with existing list."""
         comparable_list = []
 
-        for seq in self.sequence_list:
+        for seq in self:
             a = seq.initial
             b = seq.final
 
@@ -392,46 +603,8 @@ class DisjointSequences:
     def shuffle_in(self, seq, return_index = False, starting_index = 0):
         """Unions in sequence seq into self. Can also return the last index where shuffling ends."""
 
-        new_seq_list = self.sequence_list[0:]
-
-        #obtain starting and ending points of the list of sequences
-        initial_list = [seq.initial for seq in new_seq_list]
-        final_list = [seq.final for seq in new_seq_list]
-
-        start = seq.initial
-        end = seq.final
-
-        #find indices of sequences to the left and right of seq
-        i_initial = bisect_left(final_list, start.previous(), starting_index)
-        i_final = bisect_right(initial_list, end.next(), i_initial)
-
-        if i_final == 0:
-            #seq is before every sequence in the list
-
-            new_seq_list.insert(0,seq)
-
-        elif i_initial == len(initial_list):
-            #seq is after every sequence in the list
-
-            new_seq_list.append(seq)
-
-        else:
-
-            #Define sequences at the beginning
-            start_seq_list = new_seq_list[:i_initial]
-
-            #Define endpoints of sequence that will be in the middle
-            new_start = min(start, initial_list[i_initial])
-            new_end = max(end, final_list[i_final - 1])
-
-            middle_seq = ArithmeticSequence(new_start, new_end)
-
-            #Define sequences at the end
-            end_seq_list = new_seq_list[i_final:]
-
-            new_seq_list = start_seq_list + [middle_seq] + end_seq_list
-
-        ds = DisjointSequences(new_seq_list, False, True)
+        (i_initial, i_final, seq_list) = shuffle_in_range(self, seq, starting_index)
+        ds = self.replace(i_initial, i_final, seq_list)
 
         if return_index:
             return (ds, i_initial)
@@ -441,37 +614,8 @@ class DisjointSequences:
     def cut_out(self, seq, return_index = False, starting_index = 0):
         """Cuts out any elements of the sequence seq. Can also return the index of the last sequence where cutting occured."""
 
-        new_seq_list = self.sequence_list[0:]
-
-        #obtain starting and ending points of the list of sequences
-        initial_list = [seq.initial for seq in new_seq_list]
-        final_list = [seq.final for seq in new_seq_list]
-
-        start = seq.initial
-        end = seq.final
-
-        #find indices of sequences to the left and right of seq
-        i_initial = bisect_left(final_list, start.previous(), starting_index)
-        i_final = bisect_right(initial_list, end.next(), i_initial)
-
-        if i_final != 0 and i_initial != len(initial_list):
-            #seq isn't before or after every sequence in the list
-
-            #Define sequences at the beginning
-            start_seq_list = new_seq_list[:i_initial]
-
-            #Define first sequence being cut
-            middle_seq_list = new_seq_list[i_initial].cut_out(seq)
-
-            if i_initial < i_final - 1:
-                middle_seq_list = middle_seq_list + new_seq_list[i_final - 1].cut_out(seq)
-
-            #Define sequences at the end
-            end_seq_list = new_seq_list[i_final:]
-
-            new_seq_list = start_seq_list + middle_seq_list + end_seq_list
-
-        ds = DisjointSequences(new_seq_list, False, True)
+        (i_initial, i_final, seq_list) = cut_out_range(self, seq, starting_index)
+        ds = self.replace(i_initial, i_final, seq_list)
 
         if return_index:
             return (ds, i_initial)
@@ -481,57 +625,53 @@ class DisjointSequences:
     def select_larger_than(self, elem):
         """Removes all elements smaller than elem."""
 
-        new_seq_list = self.sequence_list[0:]
-
         #if self is empty, change nothing
-        if len(new_seq_list) == 0:
-            return DisjointSequences(new_seq_list, False, True)
+        if self.size == 0:
+            return DisjointSequences([], False, True)
 
         #if the bound is too small, change nothing
-        if elem < new_seq_list[0].initial:
-            return DisjointSequences(new_seq_list, False, True)
+        if elem < self[0].initial:
+            return DisjointSequences.from_blocks(self.blocks)
 
         #if the bound is too large, cut out everything
-        if elem >= new_seq_list[-1].final:
+        if elem >= self[-1].final:
             return DisjointSequences([], False, True)
 
         #otherwise, find the index of the smallest interval that intersects the bound
-        initial_list = [seq.initial for seq in new_seq_list]
-        i = bisect_right(initial_list, elem)
+        i = self.bisect_initial(elem)
 
-        #find the last sequence that might intersect the bound, and the list of everything after that
-        last_cut_seq = new_seq_list[i - 1]
-        uncut_seq_list = new_seq_list[i:]
+        #find the last sequence that might intersect the bound
+        last_cut_seq = self[i - 1]
 
         #if the last sequence really does intersect the bound, cut it accordingly
         if last_cut_seq.final > elem:
-            uncut_seq_list = [ArithmeticSequence(elem.next(), last_cut_seq.final)] + uncut_seq_list
+            return self.replace(0, i, [ArithmeticSequence(elem.next(), last_cut_seq.final)])
 
-        return DisjointSequences(uncut_seq_list, False, True)
+        return self.replace(0, i, [])
 
     def __add__(self, other):
         """Returns the union of self and other."""
 
-        ds_new = self
-        seq_list = other.sequence_list
+        merge = SequenceMerge(self)
         i_initial = 0
 
-        for seq in seq_list:
-            (ds_new, i_initial) = ds_new.shuffle_in(seq, True, i_initial)
+        for seq in other:
+            (i_initial, i_final, seq_list) = shuffle_in_range(merge, seq, i_initial)
+            merge.replace(i_initial, i_final, seq_list)
 
-        return ds_new
+        return merge.result()
 
     def __sub__(self, other):
         """Removes all elements of other from self."""
 
-        ds_new = self
-        seq_list = other.sequence_list
+        merge = SequenceMerge(self)
         i_initial = 0
 
-        for seq in seq_list:
-            (ds_new, i_initial) = ds_new.cut_out(seq, True, i_initial)
+        for seq in other:
+            (i_initial, i_final, seq_list) = cut_out_range(merge, seq, i_initial)
+            merge.replace(i_initial, i_final, seq_list)
 
-        return ds_new
+        return merge.result()
 
     def symmetric_difference(self, other):
         """Returns the symmetric difference of self and other."""
@@ -542,15 +682,222 @@ class DisjointSequences:
         return diff_1 + diff_2
 
 
+def shuffle_in_range(ds, seq, starting_index = 0):
+    """Finds how shuffling seq into ds changes it: sequences i_initial to i_final - 1 become seq_list.
+    Returns (i_initial, i_final, seq_list)."""
+
+    start = seq.initial
+    end = seq.final
+
+    #find indices of sequences to the left and right of seq
+    i_initial = ds.bisect_final(start.previous(), starting_index)
+    i_final = ds.bisect_initial(end.next(), i_initial)
+
+    if i_final == i_initial:
+        #seq is before or after every sequence in the list, or in a gap between two it does not touch
+        return (i_initial, i_initial, [seq])
+
+    #Define endpoints of sequence that will be in the middle
+    new_start = min(start, ds[i_initial].initial)
+    new_end = max(end, ds[i_final - 1].final)
+
+    return (i_initial, i_final, [ArithmeticSequence(new_start, new_end)])
+
+def cut_out_range(ds, seq, starting_index = 0):
+    """Finds how cutting seq out of ds changes it: sequences i_initial to i_final - 1 become seq_list.
+    Returns (i_initial, i_final, seq_list)."""
+
+    start = seq.initial
+    end = seq.final
+
+    #find indices of sequences to the left and right of seq
+    i_initial = ds.bisect_final(start.previous(), starting_index)
+    i_final = ds.bisect_initial(end.next(), i_initial)
+
+    if i_final == i_initial:
+        #seq is before or after every sequence in the list, or in a gap between two, nothing changes
+        return (i_initial, i_initial, [])
+
+    #Define first sequence being cut
+    middle_seq_list = ds[i_initial].cut_out(seq)
+
+    if i_initial < i_final - 1:
+        middle_seq_list = middle_seq_list + ds[i_final - 1].cut_out(seq)
+
+    return (i_initial, i_final, middle_seq_list)
+
+
+class SequenceMerge:
+    """DisjointSequences changed in place by a run of shuffle_in_range or cut_out_range, for __add__ and __sub__.
+
+    Each step searches from the index where the previous one made its change, so the list before that
+    index is final. The changed part lives in the list changed, standing in for sequences base to rest - 1
+    of source. Steps search with the same probes as on a DisjointSequences, so the same comparisons are made,
+    and a run of m steps costs O(m log n) comparisons and copies every sequence at most twice."""
+
+    def __init__(self, source):
+        self.source = source
+        self.changed = []
+        self.base = 0
+        self.rest = 0
+        self.size = source.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        if i < self.base:
+            return self.source[i]
+        i -= self.base
+        if i < len(self.changed):
+            return self.changed[i]
+        return self.source[self.rest + i - len(self.changed)]
+
+    def replace(self, i, j, seq_list):
+        """Replaces sequences i to j - 1 by seq_list. i must not be below the i of any earlier replace."""
+        if i == j and not seq_list:
+            return
+        changed = self.changed
+        if not changed and self.base == self.rest:
+            #nothing changed yet, start the changed part at i
+            self.base = self.rest = i
+
+        #move the sequences up to j from source into the changed part
+        end = self.base + len(changed)
+        if j > end:
+            changed.extend(self.source.sequences(self.rest, self.rest + j - end))
+            self.rest += j - end
+
+        changed[i - self.base:j - self.base] = seq_list
+        self.size += len(seq_list) - (j - i)
+
+    def bisect_final(self, x, lo = 0):
+        """bisect_left on the list of final elements."""
+        hi = self.size
+        base = self.base
+        end = base + len(self.changed)
+        while lo < hi:
+            if lo >= end:
+                shift = end - self.rest
+                return self.source.bisect_final(x, lo - shift, hi - shift) + shift
+            if hi <= end and lo >= base:
+                return bisect_left(self.changed, x, lo - base, hi - base, key=final_element) + base
+            mid = (lo + hi) // 2
+            if self[mid].final < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_initial(self, x, lo = 0):
+        """bisect_right on the list of initial elements."""
+        hi = self.size
+        base = self.base
+        end = base + len(self.changed)
+        while lo < hi:
+            if lo >= end:
+                shift = end - self.rest
+                return self.source.bisect_initial(x, lo - shift, hi - shift) + shift
+            if hi <= end and lo >= base:
+                return bisect_right(self.changed, x, lo - base, hi - base, key=initial_element) + base
+            mid = (lo + hi) // 2
+            if x < self[mid].initial:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def result(self):
+        """The changed sequences as a DisjointSequences, sharing the unchanged blocks of source."""
+        return self.source.replace(self.base, self.rest, self.changed)
+
+
+def add_sum_events(representation_dictionary, smallest, events):
+    """Appends events (position, +-weight) for the sums in representation_dictionary that are larger than smallest.
+    Sums with one representation have weight 1, those with multiple representations weight 2."""
+    for (key, weight) in (("One representation", 1), ("Multiple representations", 2)):
+        for seq in representation_dictionary[key]:
+            #remove anything too small
+            if smallest < seq.final:
+                start = seq.initial if smallest < seq.initial else smallest.next()
+                events.append((start, weight))
+                events.append((seq.final.next(), -weight))
+
+def sum_events(seq_list, last_seq, smallest):
+    """Events of the sums of every sequence in seq_list with last_seq, in order."""
+    events = []
+    for seq in seq_list:
+        add_sum_events(seq + last_seq, smallest, events)
+    return events
+
+def encode_sequences(seq_list):
+    """Sequences as a flat array of integers, (a0, b0, a1, b1) for a sequence from a0*N + b0 to a1*N + b1."""
+    encoded = array('q')
+    for seq in seq_list:
+        encoded.extend((seq.initial.non_st_part, seq.initial.st_part, seq.final.non_st_part, seq.final.st_part))
+    return encoded
+
+def decode_sequences(encoded):
+    return [ArithmeticSequence(NonStandardInteger(encoded[j], encoded[j + 1]), NonStandardInteger(encoded[j + 2], encoded[j + 3]))
+            for j in range(0, len(encoded), 4)]
+
+def encoded_sum_events(task):
+    """Process pool task for NonStandardUlamSequence.parallel_sum_events.
+
+    Returns the events of sum_events as a flat array, (a, b, weight) for an event at a*N + b,
+    with the minimal guess and the exclusions the comparisons needed."""
+    (encoded_seqs, encoded_last, a, b) = task
+    with NonStandardRing() as ring:
+        events = sum_events(decode_sequences(encoded_seqs), decode_sequences(encoded_last)[0], NonStandardInteger(a, b))
+        encoded = array('q')
+        for (position, weight) in events:
+            encoded.extend((position.non_st_part, position.st_part, weight))
+        return (encoded, ring.minimal_guess, ring.exclusions)
+
+def combine_partial_sums(partial1, partial2):
+    """Combines two results of encoded_sum_events, the events of partial1 first. This is associative."""
+    (events1, guess1, exclusions1) = partial1
+    (events2, guess2, exclusions2) = partial2
+    return (events1 + events2, max(guess1, guess2), sorted(set(exclusions1).union(exclusions2)))
+
+
+def split_into_blocks(seq_list, block_size):
+    """Splits a list of sequences into blocks of block_size, the last one taking up to twice that."""
+    if len(seq_list) <= 2*block_size:
+        return [seq_list] if seq_list else []
+    blocks = [seq_list[i:i + block_size] for i in range(0, len(seq_list), block_size)]
+    if len(blocks[-1]) < block_size // 2:
+        last = blocks.pop()
+        blocks[-1] = blocks[-1] + last
+    return blocks
+
+initial_element = attrgetter("initial")
+final_element = attrgetter("final")
+
+
 class NonStandardUlamSequence:
-    """Ulam sequence over non-standard integers in the ring R."""
-    def __init__(self,R,ulam_data = []):
+    """Ulam sequence over non-standard integers in the ring R.
+
+    With sweep set, the sums of each new block are counted in one sweep over their sorted endpoints
+    instead of being merged in pair by pair. The coefficients are the same, but other comparisons are made,
+    so the standardization reported can differ.
+
+    With processes > 1 the sweep is used, and once there are PARALLEL_MIN_BLOCKS blocks their sums with
+    the last block are computed by a pool of that many processes. This gives the same results and
+    standardization as the sweep in one process. Call close() to shut the pool down."""
+
+    PARALLEL_MIN_BLOCKS = 256
+
+    def __init__(self,R,ulam_data = [],sweep = False,processes = 1):
         self.base_ring = R
+        self.sweep = sweep or processes > 1
+        self.processes = processes
+        self.pool = None
+        R.activate()
 
         if ulam_data == []:
 
-            one = NonStandardInteger(0,1,R)
-            n = NonStandardInteger(1,0,R)
+            one = NonStandardInteger(0,1)
+            n = NonStandardInteger(1,0)
 
             #Keeps track of largest coefficients that have been computed.
             self.largest_constant_computed = 2*n + one
@@ -572,27 +919,27 @@ class NonStandardUlamSequence:
             #if data for specifying the sequence is provided, use that instead
             [self.ulam_ds, self.one_rep_ds, self.multiple_rep_ds] = ulam_data
 
-            self.largest_constant_computed = (self.ulam_ds.sequence_list[-1].final).next()
+            self.largest_constant_computed = (self.ulam_ds[-1].final).next()
 
     def __repr__(self):
         return("Nonstandard Ulam sequence U(1,N) computed up to " + str(self.largest_constant_computed))
 
-    def extend_one_sequence(self):
-        """Computes the next block of the Ulam sequence."""
+    def add_sums_pairwise(self):
+        """Merges the sums of the last block with every block into one_rep_ds and multiple_rep_ds, one block at a time."""
 
-        ulam_length = len(self.ulam_ds.sequence_list)
+        ulam_length = len(self.ulam_ds)
 
         #Add every block in the Ulam sequence to the last block to be added
         #No need to consider adding 1, as this is handled on the previous iteration
         for i in range(1,ulam_length):
             if i == ulam_length - 1:
                 #Addition of the last block to itself handled separately
-                seq2 = ((self.ulam_ds).sequence_list)[-1]
+                seq2 = self.ulam_ds[-1]
                 representation_dictionary = seq2.add_to_itself()
 
             else:
-                seq1 = ((self.ulam_ds).sequence_list)[i]
-                seq2 = ((self.ulam_ds).sequence_list)[-1]
+                seq1 = self.ulam_ds[i]
+                seq2 = self.ulam_ds[-1]
                 representation_dictionary = seq1 + seq2
 
             #store results as disjoint sequences
@@ -618,16 +965,122 @@ class NonStandardUlamSequence:
             #cut out everything with multiple reps from the one rep repository
             self.one_rep_ds = new_one_rep_ds - self.multiple_rep_ds
 
+    def add_sums_by_sweep(self):
+        """Merges the sums of the last block with every block into one_rep_ds and multiple_rep_ds in one sweep.
+
+        Every sequence is an interval of elements with one representation (weight 1) or more (weight 2),
+        and an element is in one_rep_ds or multiple_rep_ds by its total weight, so all sums, one_rep_ds
+        and multiple_rep_ds become events (position, +-weight), sorted once at O(k log k) comparisons."""
+
+        ulam_length = len(self.ulam_ds)
+        last_seq = self.ulam_ds[-1]
+        smallest = self.largest_constant_computed
+
+        #No need to consider adding 1, as this is handled on the previous iteration
+        seq_list = self.ulam_ds.sequences(1, ulam_length - 1)
+        if self.processes > 1 and len(seq_list) >= self.PARALLEL_MIN_BLOCKS:
+            events = self.parallel_sum_events(seq_list, last_seq, smallest)
+        else:
+            events = sum_events(seq_list, last_seq, smallest)
+        add_sum_events(last_seq.add_to_itself(), smallest, events)
+
+        for (ds, weight) in ((self.one_rep_ds, 1), (self.multiple_rep_ds, 2)):
+            previous = None
+            for seq in ds:
+                #skip repeated sequences: cut_out no longer makes them, only One_Rep files and checkpoints written before that fix hold them
+                if previous is None or previous.final < seq.initial:
+                    events.append((seq.initial, weight))
+                    events.append((seq.final.next(), -weight))
+                    previous = seq
+
+        #sort by position only, comparing tuples would compare weights with ==
+        events.sort(key=itemgetter(0))
+
+        one_rep_list = []
+        multiple_rep_list = []
+        weight = 0
+        previous_list = None
+        i = 0
+        num_events = len(events)
+
+        while i < num_events:
+            position = events[i][0]
+            weight += events[i][1]
+            i += 1
+
+            #apply every event at the same position
+            while i < num_events and not position < events[i][0]:
+                weight += events[i][1]
+                i += 1
+
+            if i == num_events:
+                break
+
+            #everything from position up to the next event has this weight
+            end = events[i][0].previous()
+
+            if weight == 0:
+                previous_list = None
+                continue
+
+            seq_list = one_rep_list if weight == 1 else multiple_rep_list
+            if seq_list is previous_list:
+                seq_list[-1] = ArithmeticSequence(seq_list[-1].initial, end)
+            else:
+                seq_list.append(ArithmeticSequence(position, end))
+            previous_list = seq_list
+
+        self.one_rep_ds = DisjointSequences(one_rep_list, False, True)
+        self.multiple_rep_ds = DisjointSequences(multiple_rep_list, False, True)
+
+    def parallel_sum_events(self, seq_list, last_seq, smallest):
+        """sum_events computed by the process pool, a chunk of seq_list per task.
+
+        The events come back in the order sum_events gives them, and the standardization
+        the workers needed is added to the base ring."""
+        if self.pool is None:
+            import multiprocessing
+            self.pool = multiprocessing.Pool(self.processes)
+
+        num_chunks = 4*self.processes
+        chunk_size = -(-len(seq_list)//num_chunks)
+        tasks = [(encode_sequences(seq_list[i:i + chunk_size]), encode_sequences([last_seq]), smallest.non_st_part, smallest.st_part)
+                 for i in range(0, len(seq_list), chunk_size)]
+        (encoded_events, guess, exclusions) = reduce(combine_partial_sums, self.pool.imap(encoded_sum_events, tasks))
+
+        self.base_ring.update_guess(guess)
+        for exclusion in exclusions:
+            self.base_ring.update_exclusions(exclusion)
+
+        return [(NonStandardInteger(encoded_events[j], encoded_events[j + 1]), encoded_events[j + 2])
+                for j in range(0, len(encoded_events), 3)]
+
+    def close(self):
+        """Shuts down the process pool, if there is one."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def extend_one_sequence(self):
+        """Computes the next block of the Ulam sequence."""
+
+        self.base_ring.activate()
+
+        if self.sweep:
+            self.add_sums_by_sweep()
+        else:
+            self.add_sums_pairwise()
 
         #the smallest sequence from one_rep_ds is our guess for the new Ulam block
-        minimal_sequence = (self.one_rep_ds).sequence_list[0]
+        minimal_sequence = self.one_rep_ds[0]
         a = minimal_sequence.initial
         b = minimal_sequence.final
 
         #cut out everything from multiple_rep_ds smaller than a
         self.multiple_rep_ds = self.multiple_rep_ds.select_larger_than(a)
 
-        n = NonStandardInteger(1,0,self.base_ring)
+        n = NonStandardInteger(1,0)
 
         if a == b:
             #By adding +1, we get a sequence, until we hit something in either one_rep_ds or multiple_rep_ds
@@ -636,24 +1089,22 @@ class NonStandardUlamSequence:
             trivial_bound = a + n
 
             #compute bound coming from one_rep_ds
-            one_rep_list = (self.one_rep_ds).sequence_list
-            if len(one_rep_list) == 1:
+            if len(self.one_rep_ds) == 1:
                 #if one_rep_ds only has one block, default to trivial bound
                 one_rep_bound = trivial_bound
 
             else:
                 #if there is something else there, choose the smallest
-                one_rep_bound = one_rep_list[1].initial
+                one_rep_bound = self.one_rep_ds[1].initial
 
             #compute bound coming from multiple_rep_ds
-            multiple_rep_list = self.multiple_rep_ds.sequence_list
-            if multiple_rep_list == []:
+            if len(self.multiple_rep_ds) == 0:
                 #if one_rep_ds is empty, default to trivial bound
                 multiple_rep_bound = trivial_bound
 
             else:
                 #if there is something there, choose the smallest
-                multiple_rep_bound = multiple_rep_list[0].initial
+                multiple_rep_bound = self.multiple_rep_ds[0].initial
 
             #actual bound is the smallest among these
             bound = min(trivial_bound, one_rep_bound)
@@ -661,7 +1112,7 @@ class NonStandardUlamSequence:
 
             #the block to add to Ulam has everything from a to bound - 1
             new_seq = ArithmeticSequence(a, bound.previous())
-            self.ulam_ds.sequence_list.append(new_seq)
+            self.ulam_ds.append(new_seq)
 
             #cut out everything from one_rep <= bound
             self.one_rep_ds = self.one_rep_ds.select_larger_than(bound)
@@ -670,43 +1121,206 @@ class NonStandardUlamSequence:
             #By adding +1, the next element after a already has two representations
             #Thus, the next block in Ulam is a singleton
             new_seq = ArithmeticSequence(a, a)
-            self.ulam_ds.sequence_list.append(new_seq)
+            self.ulam_ds.append(new_seq)
 
             #cut out everything from one_rep and multiple_rep <= a + 1
             self.one_rep_ds = self.one_rep_ds.select_larger_than(a.next())
             self.multiple_rep_ds = self.multiple_rep_ds.select_larger_than(a.next())
 
-        self.largest_constant_computed = (self.ulam_ds.sequence_list[-1].final).next()
+        self.largest_constant_computed = (self.ulam_ds[-1].final).next()
 
     def coeff_up_to(self, bound):
         if self.largest_constant_computed.less_than_wo_guess(bound):
-            while self.ulam_ds.sequence_list[-1].final.less_than_wo_guess(bound):
+            while self.ulam_ds[-1].final.less_than_wo_guess(bound):
                 self.extend_one_sequence()
 
         return self.ulam_ds
 
-def import_ds(filename, ring):
-    f = open(filename, "r")
-
-    seq_list = []
-
-    for line in f:
-        ((a0,b0),(a1,b1)) = eval(line)
-        start = NonStandardInteger(a0,b0,ring)
-        end = NonStandardInteger(a1, b1, ring)
-
-        seq = ArithmeticSequence(start, end)
-        seq_list.append(seq)
-
-    f.close()
+#A line of the text files: ((a0, b0), (a1, b1)) for the sequence from a0*N + b0 to a1*N + b1.
+SEQUENCE_LINE = re.compile(r"\(\((-?\d+), (-?\d+)\), \((-?\d+), (-?\d+)\)\)\n?")
+
+#Binary files: a header with the number of sequences, then (a0, b0, a1, b1) as four little-endian int64 per sequence.
+DS_MAGIC = b'ULAMDS01'
+DS_HEADER = struct.Struct('<8sq')
+DS_FILE_NAMES = ["Ulam_Coeff", "Ulam_One_Rep", "Ulam_Multiple_Rep"]
+
+def format_sequence(seq):
+    return str((seq.initial, seq.final)) + "\n"
+
+def parse_sequence(line, filename, line_number):
+    """The sequence on a line of a text file. Raises ValueError on a malformed line."""
+    match = SEQUENCE_LINE.fullmatch(line)
+    if match is None:
+        raise ValueError("%s:%d: not a sequence: %r" % (filename, line_number, line))
+    (a0, b0, a1, b1) = map(int, match.groups())
+    return ArithmeticSequence(NonStandardInteger(a0,b0), NonStandardInteger(a1,b1))
+
+def read_sequences(filename):
+    """Yields the sequences of a text file one line at a time. Raises ValueError on a malformed line."""
+    with open(filename, "r") as f:
+        for (line_number, line) in enumerate(f, 1):
+            yield parse_sequence(line, filename, line_number)
+
+def read_ds_array(filename):
+    """The parts of the sequences of a binary file as a flat array('q'), (a0, b0, a1, b1) per sequence."""
+    with open(filename, "rb") as f:
+        magic, count = DS_HEADER.unpack(f.read(DS_HEADER.size))
+        if magic != DS_MAGIC:
+            raise ValueError(filename + " is not a binary sequence file")
+        parts = array('q')
+        parts.frombytes(f.read())
+    if len(parts) != 4*count:
+        raise ValueError("%s: %d sequences in the header, %d in the file" % (filename, count, len(parts)//4))
+    if sys.byteorder != "little":
+        parts.byteswap()
+    return parts
+
+def map_ds_array(filename):
+    """The parts of the sequences of a binary file as a read-only NumPy memory map with one row (a0, b0, a1, b1) per sequence."""
+    import numpy as np
+    with open(filename, "rb") as f:
+        magic, count = DS_HEADER.unpack(f.read(DS_HEADER.size))
+    if magic != DS_MAGIC:
+        raise ValueError(filename + " is not a binary sequence file")
+    if count == 0:
+        return np.zeros((0, 4), dtype='<i8')
+    return np.memmap(filename, dtype='<i8', mode='r', offset=DS_HEADER.size, shape=(count, 4))
+
+def import_ds(filename):
+    """Reads disjoint sequences from a file written by export_ds; files ending in .bin are binary."""
+    if filename.endswith(".bin"):
+        parts = read_ds_array(filename)
+        seq_list = [ArithmeticSequence(NonStandardInteger(parts[j], parts[j + 1]), NonStandardInteger(parts[j + 2], parts[j + 3]))
+                    for j in range(0, len(parts), 4)]
+    else:
+        seq_list = read_sequences(filename)
 
     return DisjointSequences(seq_list, False, True)
 
+def export_ds(ds, filename):
+    """Writes disjoint sequences to a file; files ending in .bin are binary, others text."""
+    if filename.endswith(".bin"):
+        parts = array('q')
+        for seq in ds:
+            parts.extend((seq.initial.non_st_part, seq.initial.st_part, seq.final.non_st_part, seq.final.st_part))
+        if sys.byteorder != "little":
+            parts.byteswap()
+        with open(filename, "wb") as f:
+            f.write(DS_HEADER.pack(DS_MAGIC, len(ds)))
+            parts.tofile(f)
+    else:
+        with open(filename, "w") as f:
+            f.write("".join([format_sequence(seq) for seq in ds]))
+
+def import_all_Ulam_data(folder):
+    """Reads [ulam_ds, one_rep_ds, multiple_rep_ds] written by write_all_Ulam_data_up_to, from the binary files if there are any."""
+    binary = all(os.path.exists(os.path.join(folder, name + ".bin")) for name in DS_FILE_NAMES)
+    return [import_ds(os.path.join(folder, name + (".bin" if binary else ".txt"))) for name in DS_FILE_NAMES]
+
+def replace_file(filename, write):
+    """Writes filename by calling write on a temporary name and renaming that over it,
+    so the file is never seen half written."""
+    (root, extension) = os.path.splitext(filename)
+    temporary = root + ".tmp" + extension
+    write(temporary)
+    os.replace(temporary, filename)
+
+def read_checkpoint(filename):
+    """Reads a file written by write_checkpoint.
+    Returns (number of Ulam blocks, length of Ulam_Coeff.txt, length of Exclusions_Data.txt, one_rep_ds, multiple_rep_ds)."""
+    with open(filename, "r") as f:
+        lines = f.readlines()
+
+    header = lines[0].split() if lines else []
+    if len(header) != 4 or header[0] != "blocks":
+        raise ValueError(filename + " is not a checkpoint")
+    (num_blocks, coeff_bytes, exclusions_bytes) = map(int, header[1:])
+
+    ds_list = []
+    i = 1
+    for name in ("one_rep", "multiple_rep"):
+        section = lines[i].split() if i < len(lines) else []
+        if len(section) != 2 or section[0] != name or i + 1 + int(section[1]) > len(lines):
+            raise ValueError("%s:%d: expected %s and its sequences" % (filename, i + 1, name))
+        count = int(section[1])
+        seq_list = [parse_sequence(lines[j], filename, j + 1) for j in range(i + 1, i + 1 + count)]
+        ds_list.append(DisjointSequences(seq_list, False, True))
+        i += 1 + count
+
+    return (num_blocks, coeff_bytes, exclusions_bytes, ds_list[0], ds_list[1])
+
+def append_ulam_blocks(coeff_file, written_blocks):
+    """Appends the blocks of U past the first written_blocks to coeff_file. Returns the number of blocks written."""
+    num_blocks = len(U.ulam_ds)
+    coeff_file.write("".join([format_sequence(seq) for seq in U.ulam_ds.sequences(written_blocks, num_blocks)]))
+    return num_blocks
+
+def write_checkpoint(folder, coeff_file, exclusions_file, written_blocks):
+    """Brings coeff_file up to date and saves the state of U in folder/Checkpoint.txt, see write_all_Ulam_data_up_to.
+    Returns the number of blocks written."""
+    written_blocks = append_ulam_blocks(coeff_file, written_blocks)
+
+    #the checkpoint must never point past what is on disk
+    for f in (coeff_file, exclusions_file):
+        f.flush()
+        os.fsync(f.fileno())
+
+    lines = ["blocks %d %d %d\n" % (written_blocks, coeff_file.tell(), exclusions_file.tell())]
+    for (name, ds) in (("one_rep", U.one_rep_ds), ("multiple_rep", U.multiple_rep_ds)):
+        lines.append("%s %d\n" % (name, len(ds)))
+        lines.extend([format_sequence(seq) for seq in ds])
+
+    def write(filename):
+        with open(filename, "w") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    replace_file(folder + "/Checkpoint.txt", write)
+    return written_blocks
+
+def resume(folder, sweep = False, processes = 1):
+    """Rebuilds U and R to continue the data in folder, from its checkpoint or, without one, from its final files.
+
+    Ulam_Coeff.txt and Exclusions_Data.txt are cut back to the checkpoint, and write_all_Ulam_data_up_to(C, folder)
+    then appends to them what an uninterrupted run would have. Returns U."""
+    global R, U, resumedFolder
+
+    checkpointFile = folder + "/Checkpoint.txt"
+
+    #comparisons made while loading belong to no block
+    with NonStandardRing():
+        if os.path.exists(checkpointFile):
+            (num_blocks, coeff_bytes, exclusions_bytes, one_rep_ds, multiple_rep_ds) = read_checkpoint(checkpointFile)
+            for (name, size) in (("Ulam_Coeff.txt", coeff_bytes), ("Exclusions_Data.txt", exclusions_bytes)):
+                with open(folder + "/" + name, "r+b") as f:
+                    f.truncate(size)
+            ulam_ds = import_ds(folder + "/Ulam_Coeff.txt")
+            if len(ulam_ds) != num_blocks:
+                raise ValueError("%s has %d blocks, the checkpoint %d" % (folder + "/Ulam_Coeff.txt", len(ulam_ds), num_blocks))
+        else:
+            [ulam_ds, one_rep_ds, multiple_rep_ds] = import_all_Ulam_data(folder)
+            #write_all_Ulam_data_up_to appends to the text files from len(ulam_ds) on, so they must end there
+            for (name, num_lines) in (("Ulam_Coeff.txt", len(ulam_ds)), ("Exclusions_Data.txt", len(ulam_ds) - 2)):
+                with open(folder + "/" + name, "r") as f:
+                    lines = sum(1 for line in f)
+                if lines != num_lines:
+                    raise ValueError("%s has %d lines, the loaded data needs %d" % (folder + "/" + name, lines, num_lines))
+
+    U.close()
+    R = NonStandardRing()
+    R.reset_all_exclusions()
+    U = NonStandardUlamSequence(R, [ulam_ds, one_rep_ds, multiple_rep_ds], sweep, processes)
+    resumedFolder = folder
+    return U
+
 # default initialization
 R = NonStandardRing()
-n = NonStandardInteger(1,0,R)
-one = NonStandardInteger(0,1,R)
+R.activate()
+n = NonStandardInteger(1,0)
+one = NonStandardInteger(0,1)
 precomputedExclusionsFile = None
+resumedFolder = None
 U = NonStandardUlamSequence(R)
 
 
@@ -714,59 +1328,72 @@ def UlamCoefficients(C):
     """Prints all Ulam coefficients up to C."""
     return U.coeff_up_to(C * n).comparable_print()
 
-def write_all_Ulam_data_up_to(C, outFolder="Results"):
-    """Writes files with all of the important Ulam data."""
+def write_all_Ulam_data_up_to(C, outFolder="Results", binary=False, checkpoint_blocks=None, checkpoint_seconds=None):
+    """Writes files with all of the important Ulam data. With binary set, the sequences are also written to .bin files.
+
+    With checkpoint_blocks or checkpoint_seconds set, a checkpoint is taken every that many blocks or seconds:
+    the new blocks are appended to Ulam_Coeff.txt, and Checkpoint.txt, replaced in one rename, records the
+    lengths of Ulam_Coeff.txt and Exclusions_Data.txt and the sequences of one_rep_ds and multiple_rep_ds.
+    resume(outFolder) continues from it."""
 
     exclusionsFile = outFolder+"/Exclusions_Data.txt"
     os.makedirs(os.path.dirname(exclusionsFile), exist_ok=True)
 
-    if precomputedExclusionsFile:
-        copyfile(precomputedExclusionsFile, exclusionsFile)
+    if resumedFolder == outFolder:
+        #resume cut the files back to where U is, keep appending
         mode = "a"
+        written_blocks = len(U.ulam_ds)
     else:
-        mode = "w"
+        if precomputedExclusionsFile:
+            copyfile(precomputedExclusionsFile, exclusionsFile)
+            mode = "a"
+        else:
+            mode = "w"
+        written_blocks = 0
     exclusions_file = open(exclusionsFile, mode)
+    coeff_file = open(outFolder+"/Ulam_Coeff.txt", "a" if written_blocks else "w")
+
+    #.bin files left from an earlier run would go stale as the text files grow; with binary set they are written again at the end
+    for name in DS_FILE_NAMES:
+        if os.path.exists(outFolder + "/" + name + ".bin"):
+            os.remove(outFolder + "/" + name + ".bin")
 
-    while U.ulam_ds.sequence_list[-1].final.less_than_wo_guess(C*n):
+    checkpointing = checkpoint_blocks or checkpoint_seconds
+    blocks_since_checkpoint = 0
+    last_checkpoint = time.monotonic()
+
+    while U.ulam_ds[-1].final.less_than_wo_guess(C*n):
         U.extend_one_sequence()
         exclusions_file.write(str(U.largest_constant_computed) + ": " + R.print_all_exclusions())
         exclusions_file.write("\n")
         R.reset_all_exclusions()
 
-    exclusions_file.close()
-
-    ulam_file = open(outFolder+"/Ulam_Coeff.txt","w")
-    for seq in U.ulam_ds.sequence_list:
-        initial = seq.initial
-        final = seq.final
-        ulam_file.write(str((initial, final)))
-        ulam_file.write("\n")
-
-    ulam_file.close()
-
-    one_rep_file = open(outFolder+"/Ulam_One_Rep.txt","w")
-    for seq in U.one_rep_ds.sequence_list:
-        initial = seq.initial
-        final = seq.final
-        one_rep_file.write(str((initial, final)))
-        one_rep_file.write("\n")
+        blocks_since_checkpoint += 1
+        if (checkpoint_blocks and blocks_since_checkpoint >= checkpoint_blocks) or \
+           (checkpoint_seconds and time.monotonic() - last_checkpoint >= checkpoint_seconds):
+            written_blocks = write_checkpoint(outFolder, coeff_file, exclusions_file, written_blocks)
+            blocks_since_checkpoint = 0
+            last_checkpoint = time.monotonic()
 
-    one_rep_file.close()
+    if checkpointing:
+        #a last checkpoint, so that resume can go on to a larger C
+        write_checkpoint(outFolder, coeff_file, exclusions_file, written_blocks)
+    else:
+        append_ulam_blocks(coeff_file, written_blocks)
 
-    multiple_rep_file = open(outFolder+"/Ulam_Multiple_Rep.txt","w")
-    for seq in U.multiple_rep_ds.sequence_list:
-        initial = seq.initial
-        final = seq.final
-        multiple_rep_file.write(str((initial, final)))
-        multiple_rep_file.write("\n")
+    exclusions_file.close()
+    coeff_file.close()
 
-    multiple_rep_file.close()
+    export_ds(U.one_rep_ds, outFolder+"/Ulam_One_Rep.txt")
+    export_ds(U.multiple_rep_ds, outFolder+"/Ulam_Multiple_Rep.txt")
+    if binary:
+        for (name, ds) in zip(DS_FILE_NAMES, [U.ulam_ds, U.one_rep_ds, U.multiple_rep_ds]):
+            export_ds(ds, outFolder + "/" + name + ".bin")
 
     print("All data written.")
 
 
 if __name__ == "__main__":
-    import sys, os
 
     # test correctness on specific sequences
     if 1:
@@ -780,12 +1407,9 @@ if __name__ == "__main__":
 
         if 1:
             # load previous results
-            ulam_ds = import_ds("AbstractUlamDataUpTo5/Ulam_Coeff.txt",R)
-            one_rep_ds = import_ds("AbstractUlamDataUpTo5/Ulam_One_Rep.txt",R)
-            multiple_rep_ds = import_ds("AbstractUlamDataUpTo5/Ulam_Multiple_Rep.txt",R)
             precomputedExclusionsFile = "AbstractUlamDataUpTo5/Exclusions_Data.txt"
 
-            U = NonStandardUlamSequence(R, [ulam_ds, one_rep_ds, multiple_rep_ds])
+            U = NonStandardUlamSequence(R, import_all_Ulam_data("AbstractUlamDataUpTo5"))
 
         write_all_Ulam_data_up_to(512, "AbstractUlamDataUpTo512")
 
@@ -795,15 +1419,26 @@ if __name__ == "__main__":
         if len(sys.argv) > 1:
             C = int(sys.argv.pop(1))
 
+        if 0: # continue the run in Results from its last checkpoint
+            resume("Results")
+
+        elif 0: # count the sums of each block in one sweep: same coefficients, different Exclusions
+            U = NonStandardUlamSequence(R, sweep = True)
+
+        elif 0: # the same, with the sums computed by a process per core
+            U = NonStandardUlamSequence(R, processes = os.cpu_count())
+
         if 0: # just print out
             print(UlamCoefficients(C))
 
         elif 1:
-            write_all_Ulam_data_up_to(C)
+            write_all_Ulam_data_up_to(C, checkpoint_seconds = 600)
 
         elif 0: # profile
             import cProfile
             print('UlamCoefficients', C)
             cProfile.run('UlamCoefficients(C)')
 
+        U.close()
+
 
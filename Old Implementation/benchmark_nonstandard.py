@@ -0,0 +1,50 @@
+# time comparisons of non-standard integers, before and after exact integer standardization bounds
+#
+# usage: py benchmark_nonstandard.py [number of comparisons]
+#
+# "float" is the old bound ceil(float(c - a)/float(b - d)), "integer" the exact -((a - c)//(b - d)) used now.
+# Comparisons are timed with an eager ring, where every comparison computes and reports its bound,
+# and with the default batched ring, where only bounds above the current one are computed.
+
+import sys, random, timeit
+from math import ceil
+import Abstract_Ulam_Sequence as A
+
+def float_bound(a, b, c, d):
+    return ceil(float(c - a)/float(b - d))
+
+def integer_bound(a, b, c, d):
+    return -((a - c)//(b - d))
+
+def random_pairs(count, non_st_range = 512, st_range = 80):
+    ''' pairs of non-standard integers with different N coefficients, shaped like the coefficients of UlamCoefficients '''
+    pairs = []
+    while len(pairs) < count:
+        b, d = random.randrange(non_st_range), random.randrange(non_st_range)
+        if b != d:
+            pairs.append((A.NonStandardInteger(b, random.randrange(-st_range, st_range)),
+                          A.NonStandardInteger(d, random.randrange(-st_range, st_range))))
+    return pairs
+
+def time_per_call(func, args, repeat = 5):
+    ''' best time of func(*x) over args, in nanoseconds per call '''
+    best = min(timeit.repeat(lambda: [func(*x) for x in args], number=1, repeat=repeat))
+    return 1e9 * best / len(args)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(1)
+    pairs = random_pairs(count)
+    parts = [(x.st_part, x.non_st_part, y.st_part, y.non_st_part) for x, y in pairs]
+
+    print('bound      float: %6.1f ns' % time_per_call(float_bound, parts))
+    print('bound    integer: %6.1f ns' % time_per_call(integer_bound, parts))
+
+    for batched in (False, True):
+        with A.NonStandardRing(batched):
+            ns = time_per_call(A.NonStandardInteger.__lt__, pairs)
+        print('__lt__ %s ring: %6.1f ns' % ('batched' if batched else '  eager', ns))
+
+    # past 2^53 the float bound rounds, the integer one does not
+    a, b, c, d = 0, 1, 2**60 + 1, 0
+    print('ceil((2^60 + 1)/1): float', float_bound(a, b, c, d), 'integer', integer_bound(a, b, c, d))
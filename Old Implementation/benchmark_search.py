@@ -0,0 +1,56 @@
+# time the search strategies of UlamEngine on U(1,2): brute force, brute force with the NaiveUlam prefix,
+# residue bins and rational bins
+#
+# usage: py benchmark_search.py [X] [brute force limit]
+#
+# Each strategy runs from scratch to 10^3, 10^4, ... up to X (default 10^7) and must find the same terms.
+# Brute force, with or without the prefix, is quadratic in X, so it only runs up to the limit (default 10^5);
+# above it the residue terms are checked against the rational ones alone.
+
+import sys, time
+import ulam_sequence as U
+
+# "brute force" tests every candidate, "naive" takes the terms below naive_limit from NaiveUlam as UlamEngine does by default
+STRATEGIES = [('brute force', dict(brute_force=True, naive_limit=0)),
+              ('naive', dict(brute_force=True)),
+              ('residue', dict()),
+              ('rational', dict(rational=True))]
+
+def run(X, options):
+    ''' terms of U(1,2) up to X, seconds taken and the engine '''
+    options = dict(options)
+    naive_limit = options.pop('naive_limit', None)
+    start = time.perf_counter()
+    engine = U.UlamEngine(1, 2, capacity=X, **options)
+    if naive_limit is not None:
+        engine.naive_limit = naive_limit
+    engine.extend_to(X)
+    return engine.terms, time.perf_counter() - start, engine
+
+if __name__ == "__main__":
+    max_X = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**7
+    brute_force_limit = int(float(sys.argv[2])) if len(sys.argv) > 2 else 10**5
+
+    X = 1000
+    while True:
+        X = min(X, max_X)
+        expected = None
+        for name, options in STRATEGIES:
+            if options.get('brute_force') and X > brute_force_limit:
+                print('%8d %-12s skipped' % (X, name))
+                continue
+            terms, seconds, engine = run(X, options)
+            if expected is None:
+                expected = terms
+            elif terms != expected:
+                print('Mismatch of', name, 'at X =', X)
+                sys.exit(1)
+            print('%8d %-12s %9.3f s  %8d terms  candidates by brute force %d, by bins %d'
+                  % (X, name, seconds, len(terms), engine.brute_force_count, engine.residue_count))
+        if engine.rational:
+            print('%8d rational bins: p/q = %d/%d, %d nonempty' % (X, engine.numerator, engine.denominator, len(engine.occupied_keys)))
+        if X == max_X:
+            break
+        X *= 10
+
+    print('All strategies agree.')
@@ -0,0 +1,188 @@
+# in-process benchmarks of ulam_sequence and UlamCoefficients, saved as JSON per machine and commit
+#
+# usage: py benchmark_suite.py [--repeat=5] [--warmup=1] [--only=name] [--folder=benchmarkData]
+#        py benchmark_suite.py --compare old.json new.json [threshold]
+#
+# Unlike runAndTimeCommand, nothing but the call itself is timed: no interpreter startup, no imports.
+# Every case runs warmup untimed times and then repeat timed times on fresh state, with compute and
+# output timed apart: an engine records its terms and addends in memory, and writing them out is the I/O phase.
+# The results go to folder/<machine>-<commit>.json; --compare lists the cases whose median got slower
+# than threshold (default 1.1) times the old one, and exits with 1 if there are any.
+
+import sys, os, json, time, platform, statistics, subprocess, tempfile
+from array import array
+import ulam_sequence as U
+import Abstract_Ulam_Sequence as A
+from ulam_io import UlamTextWriter
+
+# the strategies of UlamEngine; "naive" is brute force with the NaiveUlam prefix, "brute force" tests every candidate
+STRATEGIES = {'brute force': dict(brute_force=True, naive_limit=0),
+              'naive': dict(brute_force=True),
+              'residue': dict(),
+              'rational': dict(rational=True)}
+
+# (strategy, X) on U(1,2); brute force is quadratic in X and stops early
+ULAM_CASES = [('brute force', 10**4), ('brute force', 10**5),
+              ('naive', 10**4), ('naive', 10**5), ('naive', 10**6),
+              ('residue', 10**4), ('residue', 10**5), ('residue', 10**6),
+              ('rational', 10**4), ('rational', 10**5), ('rational', 10**6)]
+
+# C of UlamCoefficients, the sets of profileData/ProfileAbstractUlam
+ABSTRACT_CASES = [64, 128, 256, 512, 1024]
+
+
+class TermRecorder:
+    """Collects the terms and addends an UlamEngine finds, so the search runs without writing."""
+
+    def __init__(self):
+        self.terms = array('q')
+        self.addends = array('q')
+
+    def write_term(self, u, addend):
+        self.terms.append(u)
+        self.addends.append(addend)
+
+    def flush(self):
+        pass
+
+
+def ulam_case(strategy, X, folder):
+    ''' a run of U(1,2) up to X, returns its compute and I/O seconds '''
+    options = dict(STRATEGIES[strategy])
+    naive_limit = options.pop('naive_limit', None)
+
+    start = time.perf_counter()
+    engine = U.UlamEngine(1, 2, capacity=X, **options)
+    if naive_limit is not None:
+        engine.naive_limit = naive_limit
+    engine.file = recorder = TermRecorder()
+    engine.print_addends = True
+    engine.extend_to(X)
+    compute = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.path.join(folder, 'ulam.log'), 'w') as f:
+        writer = UlamTextWriter(f, True, U.write_buffer_size)
+        for u, addend in zip(recorder.terms, recorder.addends):
+            writer.write_term(u, addend)
+        writer.flush()
+    io = time.perf_counter() - start
+    return compute, io
+
+def abstract_case(C, folder):
+    ''' UlamCoefficients(C) on a fresh ring, returns its compute and I/O seconds '''
+    start = time.perf_counter()
+    A.R = A.NonStandardRing()
+    A.U = A.NonStandardUlamSequence(A.R)
+    A.U.coeff_up_to(C * A.n)
+    compute = time.perf_counter() - start
+
+    start = time.perf_counter()
+    A.export_ds(A.U.ulam_ds, os.path.join(folder, 'Ulam_Coeff.txt'))
+    io = time.perf_counter() - start
+    return compute, io
+
+def summary(seconds):
+    ''' statistics of the timed repeats '''
+    return {'min': min(seconds), 'median': statistics.median(seconds), 'mean': statistics.mean(seconds),
+            'stdev': statistics.stdev(seconds) if len(seconds) > 1 else 0.0, 'runs': seconds}
+
+def measure(case, args, repeat, warmup):
+    ''' warmup untimed and repeat timed calls of case(*args, folder), returns the statistics of both phases '''
+    compute = []
+    io = []
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(warmup + repeat):
+            c, o = case(*args, folder)
+            if i >= warmup:
+                compute.append(c)
+                io.append(o)
+    return {'compute': summary(compute), 'io': summary(io)}
+
+def all_cases():
+    ''' name, function and arguments of every case '''
+    cases = [('ulam %s X=%d' % (strategy, X), ulam_case, (strategy, X)) for (strategy, X) in ULAM_CASES]
+    cases += [('abstract C=%d' % C, abstract_case, (C,)) for C in ABSTRACT_CASES]
+    return cases
+
+def git_commit():
+    ''' short hash of HEAD, with "-dirty" if the tree has changes, "unknown" outside git '''
+    try:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=folder, universal_newlines=True).strip()
+        changes = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=folder, universal_newlines=True)
+        return commit + ('-dirty' if changes.strip() else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def machine():
+    return {'node': platform.node(), 'system': platform.platform(), 'processor': platform.processor(),
+            'cpu_count': os.cpu_count(), 'python': platform.python_version()}
+
+def run_suite(repeat = 5, warmup = 1, only = None, folder = 'benchmarkData'):
+    ''' runs every case whose name contains only, prints the medians and writes the JSON file, returns its name
+        Cases of an earlier run for the same machine and commit stay in the file unless they ran again.
+    '''
+    results = {'machine': machine(), 'commit': git_commit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'repeat': repeat, 'warmup': warmup, 'cases': {}}
+    for name, case, args in all_cases():
+        if only and only not in name:
+            continue
+        result = measure(case, args, repeat, warmup)
+        results['cases'][name] = result
+        print('%-28s compute %10.4f s  io %8.4f s  (median of %d, stdev %.4f)'
+              % (name, result['compute']['median'], result['io']['median'], repeat, result['compute']['stdev']))
+
+    os.makedirs(folder, exist_ok=True)
+    filename = os.path.join(folder, results['machine']['node'] + '-' + results['commit'] + '.json')
+    if os.path.exists(filename):
+        # an earlier run of other cases on the same machine and commit, keep its cases
+        with open(filename) as f:
+            results['cases'] = dict(json.load(f)['cases'], **results['cases'])
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=1)
+    print('results written to', filename)
+    return filename
+
+def compare(old_file, new_file, threshold = 1.1):
+    ''' cases in both files whose median compute or I/O time grew by more than threshold, as (name, phase, old, new) '''
+    with open(old_file) as f:
+        old = json.load(f)['cases']
+    with open(new_file) as f:
+        new = json.load(f)['cases']
+    regressions = []
+    for name in new:
+        if name not in old:
+            continue
+        for phase in ('compute', 'io'):
+            before = old[name][phase]['median']
+            after = new[name][phase]['median']
+            if after > threshold * before:
+                regressions.append((name, phase, before, after))
+    return regressions
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--compare':
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 1.1
+        regressions = compare(sys.argv[2], sys.argv[3], threshold)
+        for name, phase, before, after in regressions:
+            print('%-28s %-7s %10.4f s -> %10.4f s (%+.0f%%)' % (name, phase, before, after, 100 * (after / before - 1)))
+        if not regressions:
+            print('No case got slower than', threshold, 'times its old median.')
+        sys.exit(1 if regressions else 0)
+
+    repeat = 5
+    warmup = 1
+    only = None
+    folder = 'benchmarkData'
+    for arg in sys.argv[1:]:
+        if arg.startswith('--repeat='):
+            repeat = int(arg[len('--repeat='):])
+        elif arg.startswith('--warmup='):
+            warmup = int(arg[len('--warmup='):])
+        elif arg.startswith('--only='):
+            only = arg[len('--only='):]
+        elif arg.startswith('--folder='):
+            folder = arg[len('--folder='):]
+    run_suite(repeat, warmup, only, folder)
@@ -0,0 +1,118 @@
+# randomized differential check of DisjointSequences union, difference and symmetric difference
+#
+# usage: py check_disjoint_sequences.py [number of trials] [seed]
+#
+# +, - and symmetric_difference run as one merge over both lists; here they are checked against a reference that
+# shares none of their code: shuffle_in and cut_out as they were on a flat list before the blocks, applied to the
+# sequences of the other list one at a time. That code mishandled a sequence in a gap it does not touch (a union
+# spanned the gap, a difference repeated the next sequence), the reference has the fix. Endpoints are non-standard integers, so both must also leave the ring
+# with the same standardization bound and exclusions. As a second check, the result at the fixed N = MODEL_N must be
+# the union, difference or symmetric difference of the sets of integers.
+
+import sys, random
+from bisect import bisect_left, bisect_right
+import Abstract_Ulam_Sequence as A
+
+def random_ds(max_len = 40, non_st_range = 3, st_range = 30):
+    ''' disjoint sequences with random endpoints a*N + b, some of them singletons '''
+    count = random.randrange(max_len + 1)
+    keys = sorted(set((random.randrange(non_st_range), random.randrange(-st_range, st_range)) for i in range(2*count)))
+    seq_list = []
+    i = 0
+    while i < len(keys):
+        start = A.NonStandardInteger(*keys[i])
+        if i + 1 < len(keys) and random.random() < 0.8:
+            seq_list.append(A.ArithmeticSequence(start, A.NonStandardInteger(*keys[i + 1])))
+            i += 2
+        else:
+            seq_list.append(A.ArithmeticSequence(start, start))
+            i += 1
+    return A.DisjointSequences(seq_list, False, True)
+
+def reference_shuffle_in(seq_list, seq, starting_index = 0):
+    ''' shuffle_in of the flat list DisjointSequences, returns the new list and the index where shuffling ends '''
+    initial_list = [s.initial for s in seq_list]
+    final_list = [s.final for s in seq_list]
+
+    i_initial = bisect_left(final_list, seq.initial.previous(), starting_index)
+    i_final = bisect_right(initial_list, seq.final.next(), i_initial)
+
+    if i_final == i_initial:
+        return (seq_list[:i_initial] + [seq] + seq_list[i_initial:], i_initial)
+
+    new_start = min(seq.initial, initial_list[i_initial])
+    new_end = max(seq.final, final_list[i_final - 1])
+    return (seq_list[:i_initial] + [A.ArithmeticSequence(new_start, new_end)] + seq_list[i_final:], i_initial)
+
+def reference_cut_out(seq_list, seq, starting_index = 0):
+    ''' cut_out of the flat list DisjointSequences, returns the new list and the index where cutting ends '''
+    initial_list = [s.initial for s in seq_list]
+    final_list = [s.final for s in seq_list]
+
+    i_initial = bisect_left(final_list, seq.initial.previous(), starting_index)
+    i_final = bisect_right(initial_list, seq.final.next(), i_initial)
+
+    if i_final == i_initial:
+        return (seq_list, i_initial)
+
+    middle_seq_list = seq_list[i_initial].cut_out(seq)
+    if i_initial < i_final - 1:
+        middle_seq_list = middle_seq_list + seq_list[i_final - 1].cut_out(seq)
+    return (seq_list[:i_initial] + middle_seq_list + seq_list[i_final:], i_initial)
+
+def reference_union(ds, other):
+    seq_list = list(ds)
+    i_initial = 0
+    for seq in other:
+        (seq_list, i_initial) = reference_shuffle_in(seq_list, seq, i_initial)
+    return A.DisjointSequences(seq_list, False, True)
+
+def reference_difference(ds, other):
+    seq_list = list(ds)
+    i_initial = 0
+    for seq in other:
+        (seq_list, i_initial) = reference_cut_out(seq_list, seq, i_initial)
+    return A.DisjointSequences(seq_list, False, True)
+
+def reference_symmetric_difference(ds, other):
+    return reference_union(reference_difference(ds, other), reference_difference(other, ds))
+
+# far above the standard parts of random_ds, so a*N + b keeps their order and distinctness
+MODEL_N = 1000
+
+def integer_set(ds):
+    ''' the integers in ds at N = MODEL_N '''
+    values = set()
+    for seq in ds:
+        values.update(range(seq.initial.non_st_part*MODEL_N + seq.initial.st_part, seq.final.non_st_part*MODEL_N + seq.final.st_part + 1))
+    return values
+
+def run(operation, ds, other):
+    ''' result of operation and the standardization it needed '''
+    with A.NonStandardRing(batched = False) as ring:
+        result = operation(ds, other)
+        return (result.comparable_print(), ring.print_all_exclusions())
+
+OPERATIONS = [(A.DisjointSequences.__add__, reference_union, set.union),
+              (A.DisjointSequences.__sub__, reference_difference, set.difference),
+              (A.DisjointSequences.symmetric_difference, reference_symmetric_difference, set.symmetric_difference)]
+
+if __name__ == "__main__":
+    num_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+
+    for block_size in (2, 3, 8, A.DisjointSequences.BLOCK_SIZE):
+        A.DisjointSequences.BLOCK_SIZE = block_size
+        for trial in range(num_trials):
+            ds, other = random_ds(), random_ds()
+            for merged, reference, set_operation in OPERATIONS:
+                expected = run(reference, ds, other)
+                with A.NonStandardRing(batched = False):
+                    model = integer_set(merged(ds, other)) == set_operation(integer_set(ds), integer_set(other))
+                if run(merged, ds, other) != expected or not model:
+                    print("Mismatch for", merged.__name__, "with block size", block_size)
+                    print(ds.comparable_print())
+                    print(other.comparable_print())
+                    sys.exit(1)
+
+    print("All", 4*num_trials, "trials agree.")
@@ -0,0 +1,172 @@
+# naive O(n^2) Ulam sequence for short prefixes, after naive_Ulam_sequence in UlamSequences/NaiveUlam.cpp
+#
+# Every new term is added to all earlier terms and the sums are counted (saturating at 2);
+# the next term is the smallest number above the last term that was counted exactly once.
+# The counts play the part of unique_rep (count 1 above the last term) and mult_rep (count 2) of the C++ code.
+# Sums are only counted up to a horizon that grows with the search, so the pairs of a short prefix
+# that sum far beyond it are never formed, and NaiveUlam can be saved and continued like UlamOutput.
+
+import os, sys
+import numpy as np
+
+NAIVE_STATE_VERSION = 1
+
+
+class NaiveUlam:
+    """Terms of U(a,b) by counting the sums of all pairs of terms with NumPy, resumable.
+
+    counts[v] is 0, 1 or 2 (at least two) for the representations of v as a sum of two different terms,
+    complete for every v up to horizon; raising the horizon only adds the pairs whose sum is above the old one.
+    With addends set, the first addend seen for every sum is kept, so a unique representation of v
+    is addends[v] + (v - addends[v])."""
+
+    search_window = 256 # counts scanned at a time for the next unique sum, gaps between terms are short
+
+    def __init__(self, a = 1, b = 2, addends = False):
+        if not 0 < a < b:
+            raise ValueError("U(a,b) needs 0 < a < b")
+        self.a = a
+        self.b = b
+        self.terms = np.array([a, b], dtype=np.int64)
+        self.num_terms = 2
+        self.horizon = b # every sum up to here is counted
+        self.counts = np.zeros(4 * (a + b) + 16, dtype=np.uint8)
+        self.addends = np.zeros(len(self.counts), dtype=np.int64) if addends else None
+
+    def __len__(self):
+        return self.num_terms
+
+    @property
+    def unique_rep(self):
+        """Sums above the last term with exactly one representation, so far."""
+        last = int(self.terms[self.num_terms - 1])
+        return last + 1 + np.flatnonzero(self.counts[last + 1:self.horizon + 1] == 1)
+
+    @property
+    def mult_rep(self):
+        """Sums with at least two representations, so far."""
+        return np.flatnonzero(self.counts[:self.horizon + 1] == 2)
+
+    def ensure_size(self, max_sum):
+        """Grows the count arrays so that sums up to max_sum fit."""
+        if max_sum < len(self.counts):
+            return
+        size = 2 * max_sum + 2
+        grown = np.zeros(size, dtype=np.uint8)
+        grown[:len(self.counts)] = self.counts
+        self.counts = grown
+        if self.addends is not None:
+            grown = np.zeros(size, dtype=np.int64)
+            grown[:len(self.addends)] = self.addends
+            self.addends = grown
+
+    def count_sums(self, i, low, high = None):
+        """Counts the sums of term i with the earlier terms that lie in (low, high], high defaults to the horizon."""
+        if high is None:
+            high = self.horizon
+        u = int(self.terms[i])
+        earlier = self.terms[:i]
+        first = np.searchsorted(earlier, low - u, side='right')
+        last = np.searchsorted(earlier, high - u, side='right')
+        if first >= last:
+            return
+        sums = u + earlier[first:last]
+        self.ensure_size(int(sums[-1]))
+        # sums of a fixed u are distinct, so plain fancy indexing counts each once
+        counts = self.counts[sums]
+        if self.addends is not None:
+            new = counts == 0
+            self.addends[sums[new]] = earlier[first:last][new]
+        self.counts[sums] = np.minimum(counts + 1, 2)
+
+    def raise_horizon(self, horizon):
+        """Counts the sums of all pairs of terms found so far up to the new horizon."""
+        if horizon <= self.horizon:
+            return
+        self.ensure_size(horizon)
+        # a term u can only have new sums with a smaller term if 2*u > horizon
+        first = max(int(np.searchsorted(self.terms[:self.num_terms], self.horizon // 2, side='right')), 1)
+        for i in range(first, self.num_terms):
+            self.count_sums(i, self.horizon, horizon)
+        self.horizon = horizon
+
+    def next_term(self, X):
+        """The smallest sum up to X above the last term with one representation, or None."""
+        counts = self.counts
+        start = int(self.terms[self.num_terms - 1]) + 1
+        while start <= X:
+            stop = min(start + self.search_window, X + 1)
+            unique = np.flatnonzero(counts[start:stop] == 1)
+            if len(unique):
+                return start + int(unique[0])
+            start = stop
+        return None
+
+    def append(self, u):
+        if self.num_terms == len(self.terms):
+            grown = np.zeros(2 * self.num_terms, dtype=np.int64)
+            grown[:self.num_terms] = self.terms
+            self.terms = grown
+        self.terms[self.num_terms] = u
+        self.num_terms += 1
+        self.count_sums(self.num_terms - 1, 0)
+
+    def extend_to(self, X, num_terms = None):
+        """Finds all terms up to X, or only up to the first num_terms terms, returns the terms found so far."""
+        if num_terms is None:
+            num_terms = sys.maxsize
+        self.raise_horizon(X)
+        while self.num_terms < num_terms:
+            u = self.next_term(X)
+            if u is None:
+                break
+            self.append(u)
+        return self.terms[:self.num_terms]
+
+    def extend_by(self, k_terms):
+        """Finds the next k_terms terms, returns the terms found so far."""
+        num_terms = self.num_terms + k_terms
+        while self.num_terms < num_terms:
+            # the horizon limits how far one search can go; the gaps between terms stay small, so doubling is plenty
+            self.extend_to(2 * self.horizon, num_terms)
+        return self.terms[:self.num_terms]
+
+    def addend(self, i):
+        """The smaller of the two terms that sum to term i, 0 for a and b, needs addends."""
+        u = int(self.terms[i])
+        if i < 2:
+            return 0
+        t = int(self.addends[u])
+        return min(t, u - t)
+
+    def save(self, path):
+        """Saves the state to path, an .npz file; written to a temporary file and renamed."""
+        tmp_path = path + '.tmp.npz'
+        state = {'version': NAIVE_STATE_VERSION, 'a': self.a, 'b': self.b, 'horizon': self.horizon,
+                 'terms': self.terms[:self.num_terms], 'counts': self.counts[:self.horizon + 1]}
+        if self.addends is not None:
+            state['addends'] = self.addends[:self.horizon + 1]
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Restores a NaiveUlam saved by save."""
+        with np.load(path) as state:
+            if int(state['version']) != NAIVE_STATE_VERSION:
+                raise ValueError(path + " is not a naive Ulam state of version " + str(NAIVE_STATE_VERSION))
+            naive = cls(int(state['a']), int(state['b']), 'addends' in state)
+            naive.horizon = int(state['horizon'])
+            naive.terms = np.array(state['terms'], dtype=np.int64)
+            naive.num_terms = len(naive.terms)
+            naive.counts = np.zeros(2 * naive.horizon + 2, dtype=np.uint8)
+            naive.counts[:naive.horizon + 1] = state['counts']
+            if naive.addends is not None:
+                naive.addends = np.zeros(len(naive.counts), dtype=np.int64)
+                naive.addends[:naive.horizon + 1] = state['addends']
+        return naive
+
+
+def naive_ulam_sequence(a, b, num_terms):
+    """Returns the first num_terms terms of U(a,b) as an int64 NumPy array."""
+    return NaiveUlam(a, b).extend_by(num_terms - 2)[:num_terms].copy()
@@ -0,0 +1,53 @@
+# estimate the hidden frequency lambda of an Ulam sequence, after UlamSequences/SignalProcessing.cpp
+#
+# The terms of U(a,b) cluster in the middle third of their residues mod lambda, so the cosine sum
+# sum(cos(u*x)) has a deep minimum at x = 2*pi/lambda. A grid search over (0, pi] on a short prefix
+# finds the minimum roughly, and Newton steps on longer and longer prefixes sharpen it.
+
+import numpy as np
+
+def fourier_sum(terms, x):
+    """Cosine sums of terms at every point of the array x."""
+    return np.cos(np.outer(x, terms)).sum(axis=1)
+
+def fourier_approximation(terms, num_steps = 1000):
+    """Grid point in (0, pi] with the smallest cosine sum."""
+    x = np.pi / num_steps * np.arange(1, num_steps + 1)
+    return x[np.argmin(fourier_sum(np.asarray(terms, dtype=np.float64), x))]
+
+def fourier_refinement(x, terms, first_terms = 100, num_iterations = 5):
+    """Newton steps for the minimum of the cosine sum near x.
+    The peak narrows as the terms grow, so the prefix used doubles from first_terms up to all terms,
+    each stage starting from the minimum of the previous one."""
+    terms = np.asarray(terms, dtype=np.float64)
+    m = min(first_terms, len(terms))
+    while True:
+        t = terms[:m]
+        for i in range(num_iterations):
+            tx = t * x
+            derivative = -(t * np.sin(tx)).sum()
+            second_derivative = -(t * t * np.cos(tx)).sum()
+            if second_derivative <= 0:
+                break # not near a minimum, keep the last point
+            x -= derivative / second_derivative
+        if m == len(terms):
+            return x
+        m = min(2 * m, len(terms))
+
+def middle_third_proportion(terms, lamda):
+    """Proportion of terms whose residue mod lambda is in the middle third."""
+    r = np.mod(np.asarray(terms, dtype=np.float64), lamda)
+    return np.count_nonzero((r > lamda / 3) & (r < 2 * lamda / 3)) / len(r)
+
+def estimate_lambda(terms, num_steps = 1000, first_terms = 100):
+    """Returns lambda estimated from the terms and the middle third proportion it gives."""
+    x = fourier_approximation(terms[:first_terms], num_steps)
+    x = fourier_refinement(x, terms, first_terms)
+    lamda = 2 * np.pi / x
+    return float(lamda), middle_third_proportion(terms, lamda)
+
+def refine_lambda(terms, lamda, num_iterations = 5):
+    """Newton steps for lambda on all terms, starting from a good estimate."""
+    x = fourier_refinement(2 * np.pi / lamda, terms, len(terms), num_iterations)
+    lamda = 2 * np.pi / x
+    return float(lamda), middle_third_proportion(terms, lamda)
@@ -0,0 +1,119 @@
+# specialize the abstract Ulam data of Abstract_Ulam_Sequence.py to the terms of U(1,N) for a given N
+#
+# usage: py specialize_ulam.py folder N [C]
+#
+# A block ((a0, b0), (a1, b1)) of Ulam_Coeff holds every integer from a0*N + b0 to a1*N + b1, so the terms
+# of U(1,N) are np.repeat of the block starts plus an arange, computed for all blocks at once.
+# The data is only right for N that satisfy the Exclusions_Data line of every block used,
+# "N >= g" and "N != e1, e2, ...": the line of the k-th step checks the block k + 2 it computed.
+
+import os, re, sys
+import numpy as np
+from Abstract_Ulam_Sequence import SEQUENCE_LINE, map_ds_array
+
+EXCLUSIONS_LINE = re.compile(r"\((-?\d+), (-?\d+)\): N >= (-?\d+)(?: and N != (-?\d+(?:, -?\d+)*))?\n?")
+NUM_INITIAL_BLOCKS = 2 # the blocks 1 and N..2N every computation starts with
+
+def read_parts(filename):
+    ''' the (a0, b0, a1, b1) of every block of a text file as an int64 array with a row per block '''
+    parts = []
+    with open(filename, "r") as f:
+        for (line_number, line) in enumerate(f, 1):
+            match = SEQUENCE_LINE.fullmatch(line)
+            if match is None:
+                raise ValueError("%s:%d: not a sequence: %r" % (filename, line_number, line))
+            parts.append(match.groups())
+    return np.array(parts, dtype=np.int64).reshape(-1, 4)
+
+def read_standardization(filename):
+    ''' the bound g and the exclusions of every line of an Exclusions_Data file '''
+    bounds = []
+    exclusions = []
+    with open(filename, "r") as f:
+        for (line_number, line) in enumerate(f, 1):
+            match = EXCLUSIONS_LINE.fullmatch(line)
+            if match is None:
+                raise ValueError("%s:%d: not a standardization: %r" % (filename, line_number, line))
+            bounds.append(int(match.group(3)))
+            exclusions.append([int(e) for e in match.group(4).split(", ")] if match.group(4) else [])
+    return bounds, exclusions
+
+
+class AbstractUlamData:
+    """Ulam_Coeff and Exclusions_Data of a folder written by write_all_Ulam_data_up_to, specialized to U(1,N) by N.
+
+    Ulam_Coeff.bin is memory-mapped when it is there, otherwise Ulam_Coeff.txt is parsed once."""
+
+    def __init__(self, folder):
+        binary_file = os.path.join(folder, "Ulam_Coeff.bin")
+        if os.path.exists(binary_file):
+            self.parts = map_ds_array(binary_file)
+        else:
+            self.parts = read_parts(os.path.join(folder, "Ulam_Coeff.txt"))
+
+        bounds, exclusions = read_standardization(os.path.join(folder, "Exclusions_Data.txt"))
+        if len(bounds) != len(self.parts) - NUM_INITIAL_BLOCKS:
+            raise ValueError("%s: %d blocks but %d standardization lines" % (folder, len(self.parts), len(bounds)))
+
+        # a prefix of lines holds for N >= the running maximum of its bounds, except at the exclusions so far
+        self.minimal_N = np.maximum.accumulate(np.array(bounds, dtype=np.int64)) if bounds else np.zeros(0, dtype=np.int64)
+        self.first_excluded = {}
+        for (line, excluded) in enumerate(exclusions):
+            for e in excluded:
+                self.first_excluded.setdefault(e, line)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def num_blocks(self, N, C = None):
+        ''' number of blocks with terms up to C*N, all blocks without C '''
+        if C is None:
+            return len(self.parts)
+        starts = self.parts[:, 0] * N + self.parts[:, 1]
+        num_blocks = int(np.count_nonzero(starts <= C * N))
+        if num_blocks == len(self.parts) and self.parts[-1, 2] * N + self.parts[-1, 3] < C * N:
+            raise ValueError("the data only reaches %d for N = %d, not C*N = %d" % (self.parts[-1, 2] * N + self.parts[-1, 3], N, C * N))
+        return num_blocks
+
+    def check(self, N, num_blocks):
+        ''' raises ValueError unless the first num_blocks blocks, and the one after them, are right for N '''
+        last_line = min(num_blocks + 1, len(self.parts)) - NUM_INITIAL_BLOCKS - 1
+        if last_line < 0:
+            return
+        if N < self.minimal_N[last_line]:
+            raise ValueError("the data up to block %d needs N >= %d, not %d" % (num_blocks, self.minimal_N[last_line], N))
+        if self.first_excluded.get(N, last_line + 1) <= last_line:
+            raise ValueError("the data up to block %d does not hold for N = %d" % (num_blocks, N))
+
+    def specialized_blocks(self, N, C = None, chunk_blocks = 1 << 16):
+        ''' yields the sorted terms of U(1,N) up to C*N in int64 arrays of chunk_blocks blocks each '''
+        num_blocks = self.num_blocks(N, C)
+        self.check(N, num_blocks)
+        for i in range(0, num_blocks, chunk_blocks):
+            block = np.asarray(self.parts[i:min(i + chunk_blocks, num_blocks)], dtype=np.int64)
+            starts = block[:, 0] * N + block[:, 1]
+            lengths = block[:, 2] * N + block[:, 3] - starts + 1
+            # each term is its block start plus its position in the block
+            offsets = np.cumsum(lengths) - lengths
+            terms = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()), dtype=np.int64)
+            if C is not None and i + chunk_blocks >= num_blocks:
+                terms = terms[:np.searchsorted(terms, C * N, side='right')]
+            yield terms
+
+    def specialize(self, N, C = None):
+        ''' the sorted int64 array of the terms of U(1,N) up to C*N, up to the last block without C '''
+        chunks = list(self.specialized_blocks(N, C))
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+
+def specialize(N, folder = "AbstractUlamDataUpTo3000", C = None):
+    ''' the terms of U(1,N) up to C*N from the abstract data in folder, see AbstractUlamData '''
+    return AbstractUlamData(folder).specialize(N, C)
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1]
+    N = int(sys.argv[2])
+    C = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    for terms in AbstractUlamData(folder).specialized_blocks(N, C):
+        sys.stdout.write("".join([str(u) + "\n" for u in terms.tolist()]))
@@ -0,0 +1,129 @@
+# run ulam_sequence over a grid of U(a,b) on a pool of worker processes and record every run in a results table
+#
+# usage: py sweep_ulam.py [grid] [processes] [results file] [output folder]
+#
+# grid is "readme" (U(1,n) up to n*10^6 for n = 4..17, the runs of README.MD) or "cpp" (the U(2,3), U(3,n) and U(5,n)
+# of specify_ulam_inputs in UlamSequences.cpp, up to 10^6). Jobs start longest first, estimated from the wall times
+# already in the results table, so the sweep takes about as long as its slowest job when there are enough processes.
+# Every run goes to a fresh process, so its peak RSS is its own; the table is appended to as runs finish,
+# and a run that is already in it is skipped, so an interrupted sweep picks up where it stopped.
+
+import sys, os, csv, time
+import multiprocessing
+import ulam_sequence as U
+from ulam_io import UlamTextWriter
+
+try:
+    import resource
+except ImportError:
+    resource = None # not on Windows, peak RSS is left empty
+
+RESULTS_FIELDS = ['a', 'b', 'X', 'seconds', 'terms', 'peak_rss_mb', 'lambda', 'brute_force']
+
+def readme_grid(first = 4, last = 17):
+    ''' the U(1,n) up to n*10^6 of the README table '''
+    return [(1, n, n * 1000000) for n in range(first, last + 1)]
+
+def specify_ulam_inputs(depth, X = 1000000):
+    ''' U(2,3) and U(a, a*k + res) for a = 3, 5, all residues res and k up to depth, except U(5,6), as in UlamSequences.cpp '''
+    jobs = [(2, 3, X)]
+    for a in (3, 5):
+        for res in range(1, a):
+            for k in range(1, depth + 1):
+                b = a * k + res
+                if (a, b) != (5, 6):
+                    jobs.append((a, b, X))
+    return jobs
+
+def log_file_name(a, b, X):
+    ''' ulam_sequence-nn-XXXXXXXX.log as in UlamSequenceData, with a in front for a != 1 '''
+    name = str(b).rjust(2, '0') + '-' + str(X).rjust(8, '0')
+    if a != 1:
+        name = str(a).rjust(2, '0') + '-' + name
+    return 'ulam_sequence-' + name + '.log'
+
+def peak_rss_mb():
+    ''' peak resident set size of this process in MB, None where resource is missing '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10) # bytes on macOS, KB elsewhere
+
+def run_job(job):
+    ''' runs U(a,b) up to X in this process, writing the log to folder if set, returns its row of the results table '''
+    a, b, X, folder = job
+    start = time.perf_counter()
+    engine = U.UlamEngine(a, b, None, U.num_bins, capacity=X)
+    file = None
+    if folder:
+        file = open(os.path.join(folder, log_file_name(a, b, X)), 'w')
+        engine.file = UlamTextWriter(file, True, U.write_buffer_size)
+        engine.print_addends = True
+    engine.extend_to(X)
+    if file:
+        engine.file.flush()
+        file.close()
+    seconds = time.perf_counter() - start
+    return {'a': a, 'b': b, 'X': X, 'seconds': round(seconds, 2), 'terms': len(engine),
+            'peak_rss_mb': peak_rss_mb(), 'lambda': engine.lamda, 'brute_force': int(engine.brute_force)}
+
+def read_results(filename):
+    ''' rows of the results table, an empty list if there is none yet '''
+    if not os.path.exists(filename):
+        return []
+    with open(filename, newline='') as f:
+        return list(csv.DictReader(f))
+
+def estimate_seconds(job, results):
+    ''' wall time of the same run in results, else that of the same U(a,b) scaled by X, else X: Gibbs is about linear in X '''
+    a, b, X = job[:3]
+    same_pair = [row for row in results if int(row['a']) == a and int(row['b']) == b]
+    for row in same_pair:
+        if int(row['X']) == X:
+            return float(row['seconds'])
+    if same_pair:
+        row = max(same_pair, key=lambda row: int(row['X']))
+        return float(row['seconds']) * X / int(row['X'])
+    return float(X)
+
+def sweep(jobs, processes = None, results_file = 'sweep_results.csv', folder = None):
+    ''' runs the jobs (a, b, X) not yet in results_file longest first on processes workers, appending a row per run '''
+    results = read_results(results_file)
+    done = set((int(row['a']), int(row['b']), int(row['X'])) for row in results)
+    jobs = [(a, b, X, folder) for (a, b, X) in jobs if (a, b, X) not in done]
+    jobs.sort(key=lambda job: estimate_seconds(job, results), reverse=True)
+    if not jobs:
+        return results
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    new_file = not os.path.exists(results_file)
+    start = time.perf_counter()
+    # maxtasksperchild=1 gives every run a fresh process, chunksize=1 hands the jobs out in the sorted order
+    with multiprocessing.Pool(processes, maxtasksperchild=1) as pool, open(results_file, 'a', newline='') as f:
+        writer = csv.DictWriter(f, RESULTS_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for row in pool.imap_unordered(run_job, jobs, chunksize=1):
+            writer.writerow(row)
+            f.flush()
+            results.append(row)
+            print('U(%d,%d) up to %d: %10.2f s, %d terms, peak RSS %s MB'
+                  % (row['a'], row['b'], row['X'], row['seconds'], row['terms'], row['peak_rss_mb']))
+    print('sweep of', len(jobs), 'runs: %.2f s' % (time.perf_counter() - start))
+    return results
+
+
+if __name__ == "__main__":
+    grid = sys.argv[1] if len(sys.argv) > 1 else 'readme'
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None # all cores
+    results_file = sys.argv[3] if len(sys.argv) > 3 else 'sweep_results.csv'
+    folder = sys.argv[4] if len(sys.argv) > 4 else None
+
+    if grid == 'readme':
+        jobs = readme_grid()
+    elif grid == 'cpp':
+        jobs = specify_ulam_inputs(4)
+    else:
+        raise ValueError("unknown grid " + grid + ", expected readme or cpp")
+    sweep(jobs, processes, results_file, folder)
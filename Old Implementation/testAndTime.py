@@ -1,4 +1,5 @@
 # test and time ulam_sequence routine
+# (this times whole processes; benchmark_suite.py times the calls in-process and saves the results as JSON)
 
 from runAndTimeCommand import runAndTimeCommand
 
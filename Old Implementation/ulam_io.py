@@ -0,0 +1,280 @@
+# output writers for ulam_sequence.py: buffered text and a binary format
+#
+# Both writers collect terms in arrays and write them a block at a time, optionally from a background thread.
+#
+# A file of U(a,n) starts with a header holding a, n, X, lambda and the encoding, followed by the terms
+# (a and n excluded, as in the text logs) and their smaller addends (0 when not recorded):
+#   raw:    (term, addend) int64 records, memory-mapped by the reader without any decoding
+#   delta:  blocks of uint32 term gaps followed by uint32 addends
+#   varint: blocks of term gaps followed by addends, each LEB128 varint packed
+# Delta and varint blocks start with (count, first term, payload length); the first gap of a block is 0,
+# so every block can be decoded on its own.
+
+import struct, threading, queue
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # only needed for reading
+
+MAGIC = b'ULAMBIN2'
+HEADER = struct.Struct('<8sqqqdq')
+BLOCK_HEADER = struct.Struct('<qqq')
+ENCODINGS = ['raw', 'delta', 'varint']
+UINT32_LIMIT = 1 << 32
+
+def pack_varints(values, out):
+    ''' appends values as LEB128 varints to the bytearray out '''
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7f) | 0x80)
+            v >>= 7
+        out.append(v)
+
+def unpack_varints(data):
+    ''' decodes a uint8 NumPy array of LEB128 varints in one vectorized pass '''
+    ends = np.flatnonzero((data & 0x80) == 0)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # position of every byte inside its varint gives its shift
+    value_index = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 7 * (np.arange(len(data)) - starts[value_index])
+    parts = (data & 0x7f).astype(np.int64) << shifts
+    return np.add.reduceat(parts, starts)
+
+
+class UlamTextWriter:
+    """Writes Ulam terms as 'u addend' lines, formatting buffer_size terms per write.
+
+    With threaded set, full buffers are handed to a background thread that formats and writes them,
+    so the caller does not wait for the disk. flush waits until everything handed over is written."""
+
+    def __init__(self, file, print_addends = True, buffer_size = 4096, threaded = False):
+        self.file = file
+        self.print_addends = print_addends
+        self.buffer_size = buffer_size
+        self.terms = array('q')
+        self.addends = array('q')
+        self.queue = None
+        self.error = None
+        if threaded:
+            self.queue = queue.Queue(maxsize=16) # bounds the memory held by pending buffers
+            threading.Thread(target=self.background_writer, daemon=True).start()
+
+    def write_term(self, u, addend):
+        self.terms.append(u)
+        self.addends.append(addend)
+        if len(self.terms) >= self.buffer_size:
+            self.write_buffer()
+
+    def format_lines(self, terms, addends):
+        if self.print_addends:
+            return ''.join([str(u) + ' ' + str(a) + '\n' for u, a in zip(terms, addends)])
+        return ''.join([str(u) + '\n' for u in terms])
+
+    def write_buffer(self):
+        terms = self.terms
+        addends = self.addends
+        if not terms:
+            return
+        self.terms = array('q')
+        self.addends = array('q')
+        if self.queue is None:
+            self.file.write(self.format_lines(terms, addends))
+        else:
+            if self.error:
+                raise self.error
+            self.queue.put((terms, addends))
+
+    def background_writer(self):
+        while True:
+            terms, addends = self.queue.get()
+            try:
+                if self.error is None:
+                    self.file.write(self.format_lines(terms, addends))
+            except Exception as e:
+                self.error = e # reported on the next write or flush
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        self.write_buffer()
+        if self.queue is not None:
+            self.queue.join()
+            if self.error:
+                raise self.error
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def seek(self, offset):
+        self.terms = array('q')
+        self.addends = array('q')
+        return self.file.seek(offset)
+
+    def truncate(self):
+        return self.file.truncate()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class UlamBinaryWriter:
+    """Writes Ulam terms and addends in blocks of block_size terms.
+
+    Has the flush/tell/fileno/seek/truncate methods ulam_sequence uses for checkpoints,
+    flush writes the pending terms as a (possibly short) block and rewrites the header,
+    so the file records the latest lamda and, for a resumed run, its new X."""
+
+    def __init__(self, file, n, X, lamda, encoding = 'varint', block_size = 1 << 16, a = 1):
+        if encoding not in ENCODINGS:
+            raise ValueError("encoding must be one of " + str(ENCODINGS))
+        self.file = file
+        self.encoding = encoding
+        self.block_size = block_size
+        self.terms = array('q')
+        self.addends = array('q')
+        self.a = a
+        self.n = n
+        self.X = X
+        self.lamda = lamda
+        file.seek(0)
+        self.write_header()
+
+    def write_header(self):
+        position = self.file.tell()
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.a, self.n, self.X, self.lamda, ENCODINGS.index(self.encoding)))
+        if position > HEADER.size:
+            self.file.seek(position)
+
+    def write_term(self, u, addend):
+        self.terms.append(u)
+        self.addends.append(addend)
+        if len(self.terms) >= self.block_size:
+            self.write_block()
+
+    def write_block(self):
+        terms = self.terms
+        addends = self.addends
+        if not terms:
+            return
+
+        if self.encoding == 'raw':
+            records = array('q', bytes(16 * len(terms)))
+            records[0::2] = terms
+            records[1::2] = addends
+            records.tofile(self.file)
+
+        else:
+            gaps = [0]
+            gaps.extend(terms[i] - terms[i - 1] for i in range(1, len(terms)))
+            if self.encoding == 'delta':
+                if max(gaps) >= UINT32_LIMIT or max(addends) >= UINT32_LIMIT:
+                    raise ValueError("gaps or addends too large for delta encoding, use varint")
+                payload = array('I', gaps).tobytes() + array('I', addends).tobytes()
+            else:
+                payload = bytearray()
+                pack_varints(gaps, payload)
+                pack_varints(addends, payload)
+            self.file.write(BLOCK_HEADER.pack(len(terms), terms[0], len(payload)))
+            self.file.write(payload)
+
+        self.terms = array('q')
+        self.addends = array('q')
+
+    def flush(self):
+        self.write_block()
+        self.write_header()
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def seek(self, offset):
+        self.terms = array('q')
+        self.addends = array('q')
+        return self.file.seek(offset)
+
+    def truncate(self):
+        return self.file.truncate()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_header(fileName):
+    ''' returns a, n, X, lambda and the encoding of a binary Ulam file of U(a,n) '''
+    with open(fileName, 'rb') as f:
+        magic, a, n, X, lamda, encoding = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(fileName + " is not a binary Ulam file")
+    return {'a': a, 'n': n, 'X': X, 'lambda': lamda, 'encoding': ENCODINGS[encoding]}
+
+def read_ulam_binary(fileName):
+    ''' returns the header, terms and addends of a binary Ulam file as NumPy arrays
+        For the raw encoding both arrays are views into a memory map of the file.
+    '''
+    if np is None:
+        raise ImportError("reading binary Ulam files requires numpy")
+    header = read_header(fileName)
+    data = np.memmap(fileName, dtype=np.uint8, mode='r')
+    if len(data) == HEADER.size:
+        return header, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    if header['encoding'] == 'raw':
+        records = np.memmap(fileName, dtype=np.int64, mode='r', offset=HEADER.size).reshape(-1, 2)
+        return header, records[:, 0], records[:, 1]
+
+    term_blocks = []
+    addend_blocks = []
+    pos = HEADER.size
+    while pos < len(data):
+        count, first_term, length = BLOCK_HEADER.unpack(data[pos:pos + BLOCK_HEADER.size].tobytes())
+        pos += BLOCK_HEADER.size
+        payload = data[pos:pos + length]
+        pos += length
+
+        if header['encoding'] == 'delta':
+            values = payload.view(np.uint32).astype(np.int64)
+        else:
+            values = unpack_varints(payload)
+        term_blocks.append(first_term + np.cumsum(values[:count]))
+        addend_blocks.append(values[count:])
+
+    return header, np.concatenate(term_blocks), np.concatenate(addend_blocks)
+
+def export_text(fileName, textFileName, print_addends = True):
+    ''' writes a binary Ulam file in the text format of ulam_sequence.py, returns its header
+        The text format has no header, so a, n, X and lambda are only known from the returned one.
+    '''
+    header, terms, addends = read_ulam_binary(fileName)
+    chunk = 1 << 16
+    with open(textFileName, 'w') as f:
+        for start in range(0, len(terms), chunk):
+            block_terms = terms[start:start + chunk].tolist()
+            if print_addends:
+                block_addends = addends[start:start + chunk].tolist()
+                f.write(''.join(str(u) + ' ' + str(a) + '\n' for u, a in zip(block_terms, block_addends)))
+            else:
+                f.write(''.join(str(u) + '\n' for u in block_terms))
+    return header
+
+
+if __name__ == "__main__":
+    import sys
+
+    # usage: py ulam_io.py binaryFile textFile
+    header = export_text(sys.argv[1], sys.argv[2])
+    print('U(' + str(header['a']) + ',' + str(header['n']) + ') up to', header['X'], 'lambda:', header['lambda'], 'encoding:', header['encoding'])
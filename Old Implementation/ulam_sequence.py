@@ -1,174 +1,937 @@
-import sys, os
-from sortedcontainers import SortedSet
+import sys, os, struct, time
+from array import array
+from fractions import Fraction
+from itertools import chain, islice
+from bisect import bisect_left, bisect_right, insort
+from ulam_io import UlamBinaryWriter, UlamTextWriter
+
+try:
+    import numpy as np
+    from naive_ulam import NaiveUlam
+    from signal_processing import estimate_lambda, refine_lambda, middle_third_proportion
+except ImportError:
+    np = None # only needed for use_numpy and for estimating lambda
 
 # the algorithm was adopted from the paper by Philip Gibbs, see https://vixra.org/pdf/1508.0085v2.pdf
 
 # defaults
+a = 1
 n = 2
 X = 13 # 1000
 fileName = None
-skip_launch_args = False
+resume = False # continue from fileName + '.ckpt' if it exists
+binary_encoding = None # write fileName in the binary format of ulam_io ('raw', 'delta' or 'varint') instead of text
+checkpoint_interval = 300 # seconds between snapshots when writing to a file, 0 disables
+keep_checkpoint = False # keep fileName + '.ckpt' after the run finishes, set by --resume and --checkpoint=
+write_buffer_size = 4096 # terms formatted per text write
+threaded_writer = False # format and write text output on a background thread
 
 only_brute_force = False ###
-
-# global data
-lamda = 2.44344296778474
-tolerance = 0.0001
-ulam_seq = []
-ulam_set = set(ulam_seq)
-
-# sorted sets for residue and Ulam numbers
-low_range_set = SortedSet()
-high_range_set = SortedSet()
-
-def residue(u):
-    ''' residue is in [0, 1] '''
-    return u % lamda / lamda
-
-def register_ulam(u, res = None):
-    ''' adds u to sets and list '''
-    if res is None:
-        res = residue(u) 
-    ulam_seq.append(u)
-    ulam_set.add(u)
-
-    # print("u, res", u, res)
-
-    # sets are sorted by res, then u
-    # the following was giving the wrong results:
-        # if res < 0.8/2:
-        # elif res > 0.24/2 + 0.5:
-    # let's put *everything* in the ranges for now, although this should be optimized
-    if res < 0.5 + tolerance:
-        low_range_set.add((res, u))
-    elif res > 0.5 - tolerance:
-        high_range_set.add((res, u))
-
-
-def is_ulam_brute_force(u_cand):
-    found_sum = 0
-    addend = 0
-    for cur_u in reversed(ulam_seq):
-        other_u = u_cand - cur_u
-        if other_u >= cur_u:
-            break # done with u_cand
-        if other_u not in ulam_set:
-            continue
-        
-        found_sum += 1
-        if found_sum > 1:
-            # not unique
-            break
-
-        addend = cur_u # will use it if u_cand turns out to be Ulam
-    return found_sum == 1, addend
-
-
-def is_ulam_by_residue(u_cand, cand_res):
-    ''' use Gibbs aglorithm 
-        Thresholds are computed based on this statement:
-        If 𝑡 itself has a residue 𝑟 modulo 𝜆 and if 𝑎𝑛 + 𝑎𝑚 = 𝑡 then 𝑟𝑛 +𝑟𝑚 = 𝑟 or 𝑟+𝜆.
-        This means that one of the residues 𝑟𝑛 or 𝑟𝑚 must be in one of the ranges 0 < 𝑟𝑘 < 1 2 𝑟 or 1 2 (𝑟 +𝜆) < 𝑟𝑘 < 𝜆.
-        Therefore it is only necessary to test smaller Ulam number 𝑎𝑘 whose residue 𝑟𝑘  lies in these ranges to see if it forms a sum. 
+compact_membership = False # keep terms in array('q') and membership in a bitmap instead of list and set
+use_numpy = False # test long addend scans with NumPy; needs numpy and turns on compact_membership
+adaptive_search = False # cut the residue ranges to the measured residues and pick the faster search per residue bin by timing both
+rational_bins = False # search bins of exact integer keys (u*q) % p for a convergent p/q of lambda, as UlamBins in UlamSequences.cpp
+num_bins = 128 # number of residue bins, tuning parameter (more bins scan fewer extra addends but cost more per candidate)
+
+# lambda of U(a,b): known values are used as is, others are estimated from a naive prefix
+known_lambdas = {(1, 2): 2.44344296778474}
+lambda_prefix_terms = 4000 # length of the naive prefix lambda is estimated from
+min_middle_third = 0.9 # estimates with fewer terms in the middle third are rejected and brute force is used
+refine_lambda_estimate = True # re-estimate lambda from all terms found whenever their number doubles
+
+# checkpoint layout (little endian):
+#   header: magic, a, b, last tested candidate, number of terms, number of bins, output file offset, lamda, brute force flag
+#   terms as int64, bin sizes as int64, then the bins one after another as int64
+#   an engine with rational bins writes empty residue bins, they are rebuilt from the terms when needed
+CHECKPOINT_MAGIC = b'ULAMCKP3'
+CHECKPOINT_HEADER = struct.Struct('<8sqqqqqqdq')
+
+
+def convergents(value):
+    ''' yields the convergents p/q of the continued fraction of value as pairs (p, q)
+        As compute_continued_fraction and update_convergent in UlamSequences/SignalProcessing.h, but on the exact
+        fraction of the float, so rounding does not build up in the later terms.
     '''
-    found_sum = 0
-    addend = 0
-
-    # iterate low range from smallest up
-    threshold = cand_res/2 + tolerance
-    for (cur_res, cur_u) in low_range_set.irange(maximum=(threshold,0)):
-        other_u = u_cand - cur_u
-        if other_u == cur_u:
-            continue # can't use the same number twice
-        if other_u == addend:
-            continue # this is the same pair as before
-        if other_u not in ulam_set:
-            continue
-        
-        found_sum += 1
-        if found_sum > 1:
-            # not unique
-            return False, addend
-
-        addend = cur_u # will use it if u_cand turns out to be Ulam
-
-
-    # now iterate high range from largest down.
-    threshold = cand_res/2 + 0.5 - tolerance
-    for (cur_res, cur_u) in high_range_set.irange(minimum=(threshold,0), reverse=True):
-        other_u = u_cand - cur_u
-        if other_u == cur_u:
-            continue # can't use the same number twice
-        if other_u == addend:
-            continue # this is the same pair as before
-        if other_u not in ulam_set:
-            continue
-        
-        found_sum += 1
-        if found_sum > 1:
-            # not unique
-            return False, addend
-
-        addend = cur_u # will use it if u_cand turns out to be Ulam
-            
-    return found_sum == 1, addend
-
-
-
-
-def ulam_sequence(n, X, file = None, print_addends = False):
-    """Constructs all terms up to X of U(1,n)."""
-
-    # register initial members
-    register_ulam(1)
-    register_ulam(n)
-    u_cand = n
-
-    while (True):
-        u_cand += 1
-        if u_cand > X:
+    remainder = Fraction(value)
+    p, p_previous, q, q_previous = 1, 0, 0, 1
+    while True:
+        term = remainder.numerator // remainder.denominator
+        p, p_previous = term * p + p_previous, p
+        q, q_previous = term * q + q_previous, q
+        yield p, q
+        remainder -= term
+        if remainder == 0:
+            return # value is p/q
+        remainder = 1 / remainder
+
+def choose_convergent(value, X, error):
+    ''' the first convergent p/q of value with which key/p stays within error of the residue for every u up to X
+        The key (u*q) % p over p is the fractional part of u*q/p, the residue that of u/value,
+        and the two drift apart by u*|q/p - 1/value| = u*|value*q - p|/(p*value).
+    '''
+    value = Fraction(value)
+    for p, q in convergents(value):
+        if X * abs(value * q - p) <= error * p * value:
             break
-        
-        if only_brute_force:
-            res = None
-            use_brute_force = True
+    return p, q
+
+
+class UlamEngine:
+    """Terms of the Ulam sequence U(a,b), built incrementally.
+
+    All state lives in the instance, so several sequences can be built in one process.
+    extend_to(X) tests every candidate up to X, extend_by(k) finds k more terms,
+    and iterating over the engine yields all terms, extending the sequence as needed.
+    Found terms go to file (a writer from ulam_io) if one is set, and with checkpoint_file set
+    the state is saved every checkpoint_interval seconds.
+
+    Candidates are tested by brute force, by the residue bins of the Gibbs algorithm, or with rational set
+    by the bins of UlamBins in UlamSequences.cpp: term u goes to bin (u*q) % p for a convergent p/q of lambda.
+    These keys add up exactly modulo p, so the rational search needs no tolerance and never computes a float residue.
+    The convergent is the smallest one whose key/p stays within residue_error of the residue up to the X searched,
+    a search to a larger X moves to a later convergent and rebins. p grows with X (for U(1,2) about 5*10^3 at
+    X = 10^6, 3*10^5 at 10^9 and 8*10^5 at 10^10), so the rational bins are not an array per key but chains
+    through one flat array, see init_rational_bins; they take 8 bytes per key and 8 per term."""
+
+    tolerance = 0.0001
+    residue_error = 0.01 # largest drift of key/p from the residue up to X allowed for the convergent p/q of the rational bins
+    numpy_min_slice = 64 # number of addends tested in pure Python before a scan is handed to NumPy
+    probe_interval = 8 # in adaptive mode every probe_interval-th candidate next to a window edge is timed with both searches
+    probe_batch = 32 # probes per bin before the edge next to it may move
+    naive_limit = 1 << 20 # with numpy a brute force engine takes the terms up to here from NaiveUlam, far faster on a short prefix
+
+    def __init__(self, a = 1, b = 2, lamda = None, num_bins = 128, compact = False, use_numpy = False,
+                 adaptive = False, brute_force = False, capacity = 1 << 16, verbose = False, rational = False):
+        if not 0 < a < b:
+            raise ValueError("U(a,b) needs 0 < a < b")
+        if adaptive and rational:
+            raise ValueError("adaptive search times the residue bins, it cannot be combined with rational bins")
+        if use_numpy:
+            if np is None:
+                raise ImportError("use_numpy requires numpy")
+            compact = True # the vectorized search reads the bitmap
+        self.a = a
+        self.b = b
+        self.num_bins = num_bins
+        self.compact = compact
+        self.use_numpy = use_numpy
+        self.verbose = verbose
+        self.brute_force = brute_force
+        self.refining = False
+        self.naive = None # NaiveUlam of the prefix, kept while a brute force engine is below naive_limit
+        self.lamda = 1.0
+        if lamda is not None:
+            self.lamda = lamda
+        elif not brute_force:
+            estimated = self.choose_lambda()
+            self.brute_force = estimated is None
+            self.refining = bool(estimated) and refine_lambda_estimate
+        self.adaptive = adaptive and not self.brute_force
+        self.rational = rational and not self.brute_force
+        if self.rational:
+            # the keys are exact for any p/q, a better lambda would only save a few addends
+            self.refining = False
+            self.numerator, self.denominator = choose_convergent(self.lamda, capacity, self.residue_error)
+
+        self.file = None
+        self.print_addends = False
+        self.checkpoint_file = None
+        self.checkpoint_interval = checkpoint_interval
+        self.brute_force_count = 0
+        self.residue_count = 0
+
+        self.init_membership(capacity)
+        self.init_residue_bins()
+        if self.rational:
+            self.init_rational_bins()
+        if self.adaptive:
+            self.init_adaptive_search()
+        self.register_ulam(a)
+        self.register_ulam(b)
+        self.last_candidate = b # every candidate up to here has been tested
+        self.next_refinement = 2 * lambda_prefix_terms
+
+    def residue(self, u):
+        ''' residue is in [0, 1] '''
+        return u % self.lamda / self.lamda
+
+    def residue_bin(self, res):
+        ''' bin index of residue res '''
+        k = int(res * self.num_bins)
+        return k if k < self.num_bins else self.num_bins - 1
+
+    def init_residue_bins(self):
+        ''' allocates empty residue bins; terms arrive in increasing order so each bin is append-only '''
+        # bin k holds, in increasing order, the terms with residue in [k/num_bins, (k+1)/num_bins)
+        self.residue_bins = [array('q') for _ in range(self.num_bins)]
+        self.lowest_bin = self.num_bins # bins outside [lowest_bin, highest_bin] are empty
+        self.highest_bin = -1
+
+    def init_rational_bins(self):
+        ''' allocates numerator empty bins of exact keys and the sorted keys of the nonempty bins
+            Bin k is a chain through the terms: rational_head[k] is the index in terms of its last term, -1 if it is empty,
+            and rational_next[i] that of the term before terms[i] in its bin, -1 for the first.
+        '''
+        self.rational_head = array('q', [-1]) * self.numerator
+        self.rational_next = array('q')
+        self.occupied_keys = array('q') # most bins stay empty, the search only visits these
+        # the Gibbs window in keys, brute force for key/p < 0.24 or > 0.8
+        self.low_key = -(-24 * self.numerator // 100)
+        self.high_key = 4 * self.numerator // 5
+
+    def rebuild_rational_bins(self):
+        ''' puts all terms into freshly allocated rational bins '''
+        self.init_rational_bins()
+        for u in self.terms:
+            self.add_to_rational_bin(u)
+
+    def ensure_convergent(self, X):
+        ''' moves to the convergent chosen for X and rebins if the current one drifts too far before X '''
+        numerator, denominator = choose_convergent(self.lamda, X, self.residue_error)
+        if numerator > self.numerator:
+            self.numerator, self.denominator = numerator, denominator
+            self.rebuild_rational_bins()
+
+    def add_to_rational_bin(self, u):
+        ''' links u, the last of terms, into its bin '''
+        key = u * self.denominator % self.numerator
+        head = self.rational_head
+        if head[key] < 0:
+            insort(self.occupied_keys, key)
+        self.rational_next.append(head[key])
+        head[key] = len(self.rational_next) - 1
+
+    def rational_bin_sizes(self):
+        ''' number of terms in each rational bin, by key '''
+        sizes = array('q', [0]) * self.numerator
+        denominator = self.denominator
+        numerator = self.numerator
+        for u in self.terms:
+            sizes[u * denominator % numerator] += 1
+        return sizes
+
+    def choose_lambda(self):
+        ''' sets lamda, returns whether it was estimated from a naive prefix, or None if there is no usable value '''
+        key = (self.a, self.b)
+        if key in known_lambdas:
+            self.lamda = known_lambdas[key]
+            return False
+        if np is None:
+            if self.verbose:
+                print('numpy is needed to estimate lambda, using brute force')
+            return None
+
+        # kept for the brute force fallback, which continues it
+        self.naive = NaiveUlam(self.a, self.b, True)
+        estimate, proportion = estimate_lambda(self.naive.extend_by(lambda_prefix_terms - 2))
+        if self.verbose:
+            print('lambda estimate:', estimate, 'middle third proportion:', proportion)
+        if proportion < min_middle_third:
+            if self.verbose:
+                print('no clear lambda for U(' + str(self.a) + ',' + str(self.b) + '), using brute force')
+            return None
+        self.naive = None
+        self.lamda = estimate
+        return True
+
+    def rebuild_residue_bins(self):
+        ''' puts all terms into freshly allocated residue bins, used after lambda changes '''
+        terms = np.array(self.terms, dtype=np.int64)
+        keys = np.minimum((terms % self.lamda / self.lamda * self.num_bins).astype(np.int64), self.num_bins - 1)
+        order = np.argsort(keys, kind='stable') # keeps every bin in increasing order
+        sizes = np.bincount(keys, minlength=self.num_bins)
+        self.init_residue_bins()
+        start = 0
+        for k, size in enumerate(sizes.tolist()):
+            if size:
+                self.residue_bins[k].frombytes(terms[order[start:start + size]].tobytes())
+                self.lowest_bin = min(self.lowest_bin, k)
+                self.highest_bin = max(self.highest_bin, k)
+            start += size
+
+    def refine_residue_bins(self):
+        ''' re-estimates lambda from all terms found so far and rebins them if the estimate got better '''
+        terms = np.array(self.terms, dtype=np.int64)
+        estimate, proportion = refine_lambda(terms, self.lamda)
+        if proportion >= middle_third_proportion(terms, self.lamda):
+            self.lamda = estimate
+            self.rebuild_residue_bins()
+            if isinstance(self.file, UlamBinaryWriter):
+                self.file.lamda = estimate
+
+    def init_membership(self, capacity):
+        ''' allocates storage for terms up to capacity, the bitmap grows when larger candidates are tested
+            In compact mode memory is capacity/8 bytes for the bitmap plus 8 bytes per term.
+        '''
+        if self.compact:
+            self.terms = array('q')
+            self.members = None
+            self.bits = bytearray((capacity >> 3) + 1)
+            self.bits_np = np.frombuffer(self.bits, dtype=np.uint8) if self.use_numpy else None
+        else:
+            self.terms = []
+            self.members = set()
+            self.bits = None
+            self.bits_np = None
+        self.capacity = capacity
+
+    def ensure_capacity(self, X):
+        ''' grows the bitmap so that every sum up to X can be looked up '''
+        if not self.compact or X <= self.capacity:
+            return
+        capacity = max(X, 2 * self.capacity)
+        bits = bytearray((capacity >> 3) + 1)
+        bits[:len(self.bits)] = self.bits
+        self.bits = bits
+        if self.use_numpy:
+            self.bits_np = np.frombuffer(bits, dtype=np.uint8)
+        self.capacity = capacity
+
+    def register_ulam(self, u, res = None):
+        ''' adds u to the list, the membership set and its residue bin, or its rational bin in rational mode '''
+        self.terms.append(u)
+        if self.compact:
+            self.bits[u >> 3] |= 1 << (u & 7)
         else:
-            res = residue(u_cand)
-            # use brute for low and high ends of residue
-            # Gibbs: if (rd0 < 0.24 || rd0 > 0.80) { // to mind the gap use the brute search
-            use_brute_force = res < 0.24 or res > 0.8
-
-        is_ulam = False
-        if use_brute_force:
-            is_ulam, addend = is_ulam_brute_force(u_cand)
+            self.members.add(u)
+        if self.rational:
+            self.add_to_rational_bin(u)
+            return
+
+        # every term goes into its bin, the search decides which bins to scan
+        if res is None:
+            res = self.residue(u)
+        k = self.residue_bin(res)
+        self.residue_bins[k].append(u)
+        if k < self.lowest_bin:
+            self.lowest_bin = k
+        if k > self.highest_bin:
+            self.highest_bin = k
+
+
+    def is_ulam_brute_force(self, u_cand):
+        found_sum = 0
+        addend = 0
+        compact = self.compact
+        bits = self.bits
+        members = self.members
+        for cur_u in reversed(self.terms):
+            other_u = u_cand - cur_u
+            if other_u >= cur_u:
+                break # done with u_cand
+            if compact:
+                if not bits[other_u >> 3] >> (other_u & 7) & 1:
+                    continue
+            elif other_u not in members:
+                continue
+
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                break
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+        return found_sum == 1, addend
+
+
+    def is_ulam_brute_force_numpy(self, u_cand):
+        ''' same as is_ulam_brute_force, with the terms beyond the first numpy_min_slice tested by NumPy in one shot '''
+        found_sum = 0
+        addend = 0
+        bits = self.bits
+        terms = self.terms
+        numpy_min_slice = self.numpy_min_slice
+        for cur_u in islice(reversed(terms), numpy_min_slice):
+            other_u = u_cand - cur_u
+            if other_u >= cur_u:
+                return found_sum == 1, addend # done with u_cand
+            if not bits[other_u >> 3] >> (other_u & 7) & 1:
+                continue
+
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                return False, addend
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        # remaining terms larger than u_cand/2, largest first
+        stop = max(len(terms) - numpy_min_slice, 0)
+        first = bisect_right(terms, u_cand >> 1, 0, stop)
+        if first >= stop:
+            return found_sum == 1, addend
+
+        tail = np.frombuffer(terms, dtype=np.int64)[stop - 1:first - 1 if first else None:-1]
+        others = u_cand - tail
+        hits = tail[(self.bits_np[others >> 3] >> (others & 7)) & 1 == 1].tolist()
+        for cur_u in hits:
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                return False, addend
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        return found_sum == 1, addend
+
+
+    def residue_scan_bins(self, cand_res):
+        ''' bins to scan for a candidate with residue cand_res: the low range from the smallest residue up, then the high range from the largest down
+            A sum ra + rb = r has one addend with ra <= r/2, a sum ra + rb = r + 1 one with ra >= (r + 1)/2.
+            The partner residue r - ra or r + 1 - ra belongs to a smaller term, so it lies between the lowest and the highest
+            occupied residue; in adaptive mode this cuts both ranges further.
+            Boundary bins may hold residues just outside the thresholds; testing extra addends is harmless.
+        '''
+        tolerance = self.tolerance
+        num_bins = self.num_bins
+        low_first = self.lowest_bin
+        low_last = int((cand_res/2 + tolerance) * num_bins) # both below 1 for cand_res <= 1, no clamping needed
+        high_first = int((cand_res/2 + 0.5 - tolerance) * num_bins)
+        high_last = self.highest_bin
+        if self.adaptive:
+            residue_bin = self.residue_bin
+            lowest_res = low_first / num_bins
+            highest_res = (high_last + 1) / num_bins
+            low_first = max(low_first, residue_bin(cand_res - highest_res - tolerance))
+            high_first = max(high_first, residue_bin(cand_res + 1 - highest_res - tolerance))
+            high_last = min(high_last, residue_bin(cand_res + 1 - lowest_res + tolerance))
+        high_first = max(high_first, low_last + 1)
+
+        scan_bins = self.residue_bins[low_first:low_last + 1]
+        if high_first <= high_last:
+            high_bins = self.residue_bins[high_first:high_last + 1]
+            high_bins.reverse()
+            scan_bins += high_bins
+        return scan_bins
+
+    def init_adaptive_search(self):
+        ''' starts from the fixed Gibbs window: brute force for bins below low_edge or from high_edge up '''
+        self.low_edge = int(0.24 * self.num_bins)
+        self.high_edge = -int(-0.8 * self.num_bins)
+        self.brute_force_table = bytearray(self.num_bins) # nonzero for candidate residue bins that use brute force
+        self.set_brute_force_window()
+        # per bin: candidates seen, probes, brute force time and residue time summed over the probes
+        self.probe_state = [[0, 0, 0.0, 0.0] for k in range(self.num_bins)]
+
+    def set_brute_force_window(self):
+        for k in range(self.num_bins):
+            self.brute_force_table[k] = k < self.low_edge or k >= self.high_edge
+
+    def is_probe_bin(self, k):
+        ''' only the bins on either side of the window edges are probed, elsewhere the slower path is far slower '''
+        return k in (self.low_edge - 1, self.low_edge, self.high_edge - 1, self.high_edge)
+
+    def probe_search(self, u_cand, res, k):
+        ''' runs both searches for u_cand and times them; once a bin next to a window edge has probe_batch probes,
+            the edge moves by one bin if that bin is faster with the other search
+        '''
+        state = self.probe_state[k]
+        brute_search = self.is_ulam_brute_force_numpy if self.use_numpy else self.is_ulam_brute_force
+        residue_search = self.is_ulam_by_residue_numpy if self.use_numpy else self.is_ulam_by_residue
+
+        start = time.perf_counter()
+        result = brute_search(u_cand)
+        middle = time.perf_counter()
+        residue_search(u_cand, res)
+        end = time.perf_counter()
+
+        state[1] += 1
+        state[2] += middle - start
+        state[3] += end - middle
+        if state[1] < self.probe_batch:
+            return result
+
+        brute_faster = state[2] < state[3]
+        state[1:] = [0, 0.0, 0.0]
+        low_edge = self.low_edge
+        high_edge = self.high_edge
+        if k == low_edge - 1 and not brute_faster:
+            low_edge -= 1
+        elif k == low_edge and brute_faster and low_edge < high_edge:
+            low_edge += 1
+        elif k == high_edge and not brute_faster:
+            high_edge += 1
+        elif k == high_edge - 1 and brute_faster and high_edge > low_edge:
+            high_edge -= 1
+        else:
+            return result
+        self.low_edge = low_edge
+        self.high_edge = high_edge
+        for j in (low_edge - 1, low_edge, high_edge - 1, high_edge):
+            if 0 <= j < self.num_bins:
+                self.probe_state[j][1:] = [0, 0.0, 0.0] # the bins now next to an edge start counting afresh
+        self.set_brute_force_window()
+        return result
+
+    def outlier_proportion(self):
+        ''' proportion of terms with residue outside the middle third, as UlamBins::outlier_proportion in the C++ port '''
+        outliers = 0
+        if self.rational:
+            numerator = self.numerator
+            sizes = self.rational_bin_sizes()
+            outliers = sum(sizes[k] for k in self.occupied_keys if not numerator < 3 * k < 2 * numerator)
+            return outliers / max(len(self.terms), 1)
+        num_bins = self.num_bins
+        for k, b in enumerate(self.residue_bins):
+            if (k + 1) / num_bins <= 1/3 or k / num_bins >= 2/3:
+                outliers += len(b)
+            elif k / num_bins < 1/3 or (k + 1) / num_bins > 2/3:
+                outliers += sum(1 for u in b if not 1/3 < self.residue(u) < 2/3) # bin straddles a boundary
+        return outliers / max(len(self.terms), 1)
+
+
+    def is_ulam_by_residue(self, u_cand, cand_res):
+        ''' use Gibbs aglorithm
+            Thresholds are computed based on this statement:
+            If 𝑡 itself has a residue 𝑟 modulo 𝜆 and if 𝑎𝑛 + 𝑎𝑚 = 𝑡 then 𝑟𝑛 +𝑟𝑚 = 𝑟 or 𝑟+𝜆.
+            This means that one of the residues 𝑟𝑛 or 𝑟𝑚 must be in one of the ranges 0 < 𝑟𝑘 < 1 2 𝑟 or 1 2 (𝑟 +𝜆) < 𝑟𝑘 < 𝜆.
+            Therefore it is only necessary to test smaller Ulam number 𝑎𝑘 whose residue 𝑟𝑘  lies in these ranges to see if it forms a sum.
+        '''
+        found_sum = 0
+        addend = 0
+        compact = self.compact
+        bits = self.bits
+        members = self.members
+
+        for cur_u in chain.from_iterable(self.residue_scan_bins(cand_res)):
+            other_u = u_cand - cur_u
+            if other_u == cur_u:
+                continue # can't use the same number twice
+            if other_u == addend:
+                continue # this is the same pair as before
+            if compact:
+                if not bits[other_u >> 3] >> (other_u & 7) & 1:
+                    continue
+            elif other_u not in members:
+                continue
+
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                return False, addend
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        return found_sum == 1, addend
+
+
+    def is_ulam_by_residue_numpy(self, u_cand, cand_res):
+        ''' same search as is_ulam_by_residue, with the long tail of the scan vectorized
+            Most candidates find two representations among the first few addends, so the first numpy_min_slice
+            addends are tested in pure Python. Whatever remains is pulled from the bins as one contiguous int64 array,
+            u_cand - terms is computed in one shot and looked up in the bitmap by fancy indexing.
+            Only the hits go through the pair bookkeeping, in scan order, stopping at the second representation.
+        '''
+        found_sum = 0
+        addend = 0
+        bits = self.bits
+        numpy_min_slice = self.numpy_min_slice
+
+        scan_bins = self.residue_scan_bins(cand_res)
+        addends = chain.from_iterable(scan_bins)
+        for cur_u in islice(addends, numpy_min_slice):
+            other_u = u_cand - cur_u
+            if other_u == cur_u:
+                continue # can't use the same number twice
+            if other_u == addend:
+                continue # this is the same pair as before
+            if not bits[other_u >> 3] >> (other_u & 7) & 1:
+                continue
+
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                return False, addend
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        if next(addends, None) is None:
+            return found_sum == 1, addend # the whole scan fit in the Python part
+
+        # collect the addends not tested yet
+        skip = numpy_min_slice
+        pieces = []
+        for b in scan_bins:
+            size = len(b)
+            if skip >= size:
+                skip -= size
+                continue
+            pieces.append(np.frombuffer(b, dtype=np.int64)[skip:])
+            skip = 0
+        terms = np.concatenate(pieces)
+        others = u_cand - terms
+        hits = terms[(self.bits_np[others >> 3] >> (others & 7)) & 1 == 1].tolist()
+        for cur_u in hits:
+            other_u = u_cand - cur_u
+            if other_u == cur_u:
+                continue # can't use the same number twice
+            if other_u == addend:
+                continue # this is the same pair as before
+
+            found_sum += 1
+            if found_sum > 1:
+                # not unique
+                return False, addend
+
+            addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        return found_sum == 1, addend
+
+
+    def is_ulam_by_rational_bins(self, u_cand, key):
+        ''' Gibbs search on the exact bins, as UlamBins::compute_arc in UlamSequences.cpp
+            If u + v = u_cand then key(u) + key(v) = key or key + p with all keys in [0, p),
+            so one of the keys is at most key/2 or at least (key + p)/2, and only those bins are scanned.
+            The partner key key - key(u) or key + p - key(u) lies between the smallest and the largest occupied key,
+            which cuts both ranges further. All bounds are exact, there is no tolerance as around the residue bins.
+            A pair is met twice only with both keys on the same bound, the addend check skips the second visit.
+        '''
+        found_sum = 0
+        addend = 0
+        compact = self.compact
+        bits = self.bits
+        members = self.members
+        terms = self.terms
+        head = self.rational_head
+        next_in_bin = self.rational_next
+        occupied_keys = self.occupied_keys
+
+        lowest = occupied_keys[0]
+        highest = occupied_keys[-1]
+        wrapped = key + self.numerator
+
+        # the low range from the smallest key up, then the high range from the largest down, as residue_scan_bins
+        low_start = bisect_left(occupied_keys, key - highest)
+        low_end = bisect_right(occupied_keys, min(key >> 1, key - lowest))
+        high_start = bisect_left(occupied_keys, max((wrapped + 1) >> 1, wrapped - highest))
+        high_end = bisect_right(occupied_keys, wrapped - lowest)
+        for k in chain(range(low_start, low_end), range(high_end - 1, high_start - 1, -1)):
+            i = head[occupied_keys[k]]
+            while i >= 0:
+                cur_u = terms[i]
+                i = next_in_bin[i]
+                other_u = u_cand - cur_u
+                if other_u == cur_u:
+                    continue # can't use the same number twice
+                if other_u == addend:
+                    continue # this is the same pair as before
+                if compact:
+                    if not bits[other_u >> 3] >> (other_u & 7) & 1:
+                        continue
+                elif other_u not in members:
+                    continue
+
+                found_sum += 1
+                if found_sum > 1:
+                    # not unique
+                    return False, addend
+
+                addend = cur_u # will use it if u_cand turns out to be Ulam
+
+        return found_sum == 1, addend
+
+
+    def extend_naive(self, X, num_terms):
+        ''' tests the candidates up to X with NaiveUlam, stopping early once there are num_terms terms
+            NaiveUlam counts the sums of all pairs at once, so on a short prefix it beats testing candidates one by one.
+        '''
+        if self.naive is None:
+            self.naive = NaiveUlam(self.a, self.b, True) # after a resume it recounts the prefix
+        naive = self.naive
+        terms = naive.extend_to(X, num_terms)
+        file = self.file
+        for i in range(len(self.terms), len(terms)):
+            u = int(terms[i])
+            self.register_ulam(u)
+            if file:
+                file.write_term(u, naive.addend(i) if self.print_addends else 0)
+        self.last_candidate = X if len(terms) < num_terms else int(terms[-1])
+        if self.last_candidate >= self.naive_limit:
+            self.naive = None # done with the prefix, free its counts
+
+    def search(self, X, num_terms):
+        ''' tests candidates up to X, stopping early once there are num_terms terms '''
+        self.ensure_capacity(X)
+        if self.brute_force and self.last_candidate < self.naive_limit and np is not None:
+            self.extend_naive(min(X, self.naive_limit), num_terms)
+        terms = self.terms
+        file = self.file
+        print_addends = self.print_addends
+        register_ulam = self.register_ulam
+        brute_force = self.brute_force
+        adaptive = self.adaptive
+        rational = self.rational
+        lamda = self.lamda
+        if self.use_numpy:
+            brute_search = self.is_ulam_brute_force_numpy
+            residue_search = self.is_ulam_by_residue_numpy
         else:
-            is_ulam, addend = is_ulam_by_residue(u_cand, res)
+            brute_search = self.is_ulam_brute_force
+            residue_search = self.is_ulam_by_residue
+        if rational:
+            self.ensure_convergent(X)
+            residue_search = self.is_ulam_by_rational_bins # called with the key in place of the residue
+            numerator = self.numerator
+            denominator = self.denominator
+            low_key = self.low_key
+            high_key = self.high_key
+        checkpointing = self.checkpoint_file is not None and self.checkpoint_interval > 0
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+        brute_force_count = 0
+        residue_count = 0
+
+        u_cand = self.last_candidate
+        while len(terms) < num_terms:
+            u_cand += 1
+            if u_cand > X:
+                u_cand = X
+                break
+
+            if brute_force:
+                res = None
+                use_brute_force = True
+            elif rational:
+                res = u_cand * denominator % numerator
+                use_brute_force = res < low_key or res > high_key
+            elif adaptive:
+                res = u_cand % lamda / lamda
+                k = self.residue_bin(res)
+                use_brute_force = self.brute_force_table[k]
+                if self.is_probe_bin(k):
+                    state = self.probe_state[k]
+                    state[0] += 1
+                    if state[0] % self.probe_interval == 0:
+                        use_brute_force = None # both searches run
+            else:
+                res = u_cand % lamda / lamda
+                # use brute for low and high ends of residue
+                # Gibbs: if (rd0 < 0.24 || rd0 > 0.80) { // to mind the gap use the brute search
+                use_brute_force = res < 0.24 or res > 0.8
+
+            if use_brute_force is None:
+                brute_force_count += 1
+                residue_count += 1
+                is_ulam, addend = self.probe_search(u_cand, res, k)
+            elif use_brute_force:
+                brute_force_count += 1
+                is_ulam, addend = brute_search(u_cand)
+            else:
+                residue_count += 1
+                is_ulam, addend = residue_search(u_cand, res)
+
+            if is_ulam:
+                # register next Ulam number
+                register_ulam(u_cand, res)
+
+                if file:
+                    file.write_term(u_cand, min(addend, u_cand - addend) if print_addends else 0)
+
+                if self.refining and len(terms) >= self.next_refinement:
+                    self.refine_residue_bins()
+                    self.next_refinement *= 2
+                    lamda = self.lamda
+
+                # look at the clock only every 1024 terms
+                if checkpointing and len(terms) & 1023 == 0 and time.monotonic() >= next_checkpoint:
+                    self.last_candidate = u_cand
+                    self.write_checkpoint(self.checkpoint_file)
+                    next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+        self.last_candidate = u_cand
+        self.brute_force_count += brute_force_count
+        self.residue_count += residue_count
+
+    def extend_to(self, X):
+        ''' finds all terms up to X, returns the terms found so far '''
+        if X > self.last_candidate:
+            self.search(X, sys.maxsize)
+        return self.terms
+
+    def extend_by(self, k_terms):
+        ''' finds the next k_terms terms, returns the terms found so far '''
+        num_terms = len(self.terms) + k_terms
+        while len(self.terms) < num_terms:
+            # the bitmap limits how far one search can go; the gaps between terms stay small, so doubling is plenty
+            self.search(max(2 * self.last_candidate, self.capacity), num_terms)
+        return self.terms
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __getitem__(self, i):
+        ''' the i-th term, extending the sequence if needed '''
+        if isinstance(i, int) and i >= len(self.terms):
+            self.extend_by(i + 1 - len(self.terms))
+        return self.terms[i]
+
+    def __iter__(self):
+        ''' yields all terms, extending the sequence as it goes '''
+        i = 0
+        while True:
+            if i == len(self.terms):
+                self.extend_by(max(len(self.terms), 1024))
+            yield self.terms[i]
+            i += 1
+
+
+    def write_checkpoint(self, path):
+        ''' snapshots the state; written to a temporary file and renamed, so a crash never leaves a partial snapshot '''
+        file_offset = 0
+        if self.file:
+            # the offset may only be recorded once the output up to it is on disk
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            file_offset = self.file.tell()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, self.a, self.b, self.last_candidate, len(self.terms),
+                                           self.num_bins, file_offset, self.lamda, int(self.brute_force)))
+            (self.terms if self.compact else array('q', self.terms)).tofile(f)
+            array('q', [len(b) for b in self.residue_bins]).tofile(f)
+            for b in self.residue_bins:
+                b.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_checkpoint(cls, path, compact = False, use_numpy = False, adaptive = False, capacity = 1 << 16, verbose = False, rational = False):
+        ''' restores an engine saved by write_checkpoint, returns it and the output file offset of the snapshot '''
+        with open(path, 'rb') as f:
+            magic, a, b, last_candidate, num_terms, num_bins, file_offset, lamda, brute_force = CHECKPOINT_HEADER.unpack(f.read(CHECKPOINT_HEADER.size))
+            if magic != CHECKPOINT_MAGIC:
+                raise ValueError(path + " is not an Ulam checkpoint")
+            # the bins were built with the checkpoint's lambda and number of bins; a brute force run has lambda 1.0 and stays brute force
+            engine = cls(a, b, lamda, num_bins, compact, use_numpy, adaptive, bool(brute_force), max(capacity, last_candidate), verbose, rational)
+
+            terms = array('q')
+            terms.fromfile(f, num_terms)
+            sizes = array('q')
+            sizes.fromfile(f, num_bins)
+            engine.init_residue_bins()
+            for k, size in enumerate(sizes):
+                engine.residue_bins[k].fromfile(f, size)
+                if size:
+                    engine.lowest_bin = min(engine.lowest_bin, k)
+                    engine.highest_bin = max(engine.highest_bin, k)
+
+        engine.init_membership(engine.capacity)
+        engine.terms.extend(terms)
+        if engine.rational:
+            engine.init_residue_bins() # unused, and saving them again after more terms would leave them stale
+            engine.rebuild_rational_bins()
+        elif not any(sizes):
+            # saved with rational bins
+            if np is None:
+                raise ImportError(path + " was saved with rational bins, resuming it without them needs numpy")
+            engine.rebuild_residue_bins()
+        if engine.compact:
+            bits = engine.bits
+            for u in terms:
+                bits[u >> 3] |= 1 << (u & 7)
+        else:
+            engine.members.update(terms)
+        engine.last_candidate = last_candidate
+        engine.refining = (a, b) not in known_lambdas and np is not None and refine_lambda_estimate and not engine.rational and not engine.brute_force
+        engine.next_refinement = 2 * max(num_terms, lambda_prefix_terms)
+        return engine, file_offset
+
+
+def ulam_sequence(n, X, file = None, print_addends = False, checkpoint_file = None, a = 1):
+    """Constructs all terms up to X of U(a,n) with an UlamEngine configured from the module settings.
+    Text output to file goes through a buffered UlamTextWriter unless file is already a writer from ulam_io.
+    With checkpoint_file the state is saved every checkpoint_interval seconds, and with resume set
+    the run continues from that file, truncating the output file back to the snapshot.
+    The snapshot is removed once the run finishes, unless keep_checkpoint is set."""
+    if file and not hasattr(file, 'write_term'):
+        file = UlamTextWriter(file, print_addends, write_buffer_size, threaded_writer)
+
+    if resume and checkpoint_file and os.path.exists(checkpoint_file):
+        engine, file_offset = UlamEngine.from_checkpoint(checkpoint_file, compact_membership, use_numpy, adaptive_search, X, True, rational_bins)
+        if (engine.a, engine.b) != (a, n):
+            raise ValueError("checkpoint was made for U(" + str(engine.a) + "," + str(engine.b) + ")")
+        if engine.last_candidate > X:
+            raise ValueError("checkpoint is already past X = " + str(X))
+        print('resuming after', engine.last_candidate, 'with', len(engine), 'terms')
+        if file:
+            if os.fstat(file.fileno()).st_size < file_offset:
+                raise ValueError("output file is shorter than the checkpoint offset " + str(file_offset) + ", it was not saved with the checkpoint")
+            file.seek(file_offset)
+            file.truncate()
+    else:
+        engine = UlamEngine(a, n, None, num_bins, compact_membership, use_numpy, adaptive_search, only_brute_force, X, True, rational_bins)
 
+    if isinstance(file, UlamBinaryWriter):
+        file.lamda = engine.lamda
+    engine.file = file
+    engine.print_addends = print_addends
+    checkpointing = checkpoint_file is not None and checkpoint_interval > 0
+    if checkpointing:
+        engine.checkpoint_file = checkpoint_file
 
-        if is_ulam:
-            # register next Ulam number
-            register_ulam(u_cand, res)
+    engine.extend_to(X)
 
-            if file:
-                addend_str = ''
-                if print_addends:
-                    smaller_addend = min(addend, u_cand - addend)
-                    addend_str = ' ' + str(smaller_addend)
-                file.write(str(u_cand) + addend_str + '\n')
-                # file.write(str(residue(u_cand)) + '\n')
-
-    print('low_range_set size:', len(low_range_set))
-    # print(low_range_set)
-    # print
-    print('high_range_set size:', len(high_range_set))
-    # print(high_range_set)
-    # print
-    print('ulam_seq size:', len(ulam_seq))
+    if checkpointing and keep_checkpoint:
+        # a final snapshot lets a later run with larger X continue from here
+        engine.write_checkpoint(checkpoint_file)
+    else:
+        if file:
+            file.flush()
+        if checkpoint_file and os.path.exists(checkpoint_file):
+            # only needed had the run stopped early, and as large as the terms and bins
+            os.remove(checkpoint_file)
+
+    print('lambda:', engine.lamda, 'brute force only' if engine.brute_force else '')
+    if engine.rational:
+        print('rational bins: p/q =', str(engine.numerator) + '/' + str(engine.denominator), 'nonempty bins:', len(engine.occupied_keys))
+    print('candidates by brute force:', engine.brute_force_count, 'by residue:', engine.residue_count, '(probes count for both)' if engine.adaptive else '')
+    if engine.adaptive:
+        print('brute force window: residue <', engine.low_edge / engine.num_bins, 'or >=', engine.high_edge / engine.num_bins)
+    sizes = engine.rational_bin_sizes() if engine.rational else [len(b) for b in engine.residue_bins]
+    print('residue bins:', len(sizes), 'largest bin size:', max(sizes), 'outlier proportion:', engine.outlier_proportion())
+    print('ulam_seq size:', len(engine))
     print
 
-    return ulam_seq
-
-if not skip_launch_args:
+    return engine.terms
+
+
+if __name__ == "__main__":
+    if '--compact' in sys.argv:
+        sys.argv.remove('--compact')
+        compact_membership = True
+    if '--numpy' in sys.argv:
+        sys.argv.remove('--numpy')
+        use_numpy = True
+    if '--adaptive' in sys.argv:
+        sys.argv.remove('--adaptive')
+        adaptive_search = True
+    if '--rational' in sys.argv:
+        sys.argv.remove('--rational')
+        rational_bins = True
+    if '--threaded' in sys.argv:
+        sys.argv.remove('--threaded')
+        threaded_writer = True
+    if '--resume' in sys.argv:
+        sys.argv.remove('--resume')
+        resume = True
+        keep_checkpoint = True
+    for arg in sys.argv[1:]:
+        if arg.startswith('--a='):
+            sys.argv.remove(arg)
+            a = int(arg[len('--a='):])
+        elif arg.startswith('--bins='):
+            sys.argv.remove(arg)
+            num_bins = int(arg[len('--bins='):])
+        elif arg.startswith('--binary='):
+            sys.argv.remove(arg)
+            binary_encoding = arg[len('--binary='):]
+        elif arg.startswith('--buffer='):
+            sys.argv.remove(arg)
+            write_buffer_size = int(arg[len('--buffer='):])
+        elif arg.startswith('--checkpoint='):
+            sys.argv.remove(arg)
+            checkpoint_interval = float(arg[len('--checkpoint='):])
+            keep_checkpoint = True
     if len(sys.argv) > 1:
         n = int(sys.argv.pop(1))
     if len(sys.argv) > 1:
@@ -176,28 +939,35 @@ if not skip_launch_args:
     if len(sys.argv) > 1:
         fileName = sys.argv.pop(1)
 
-# print("ulam_sequence("+str(n)+","+str(X)+")", ulam_sequence(n,X))
-if fileName:
-    if os.path.exists(fileName):
-        os.remove(fileName)
-    file = open(fileName, 'w+')
-
-    if 1:
-        # print inside the method with addends
-        ulam_sequence(n, X, file, True)
+    # print("ulam_sequence("+str(n)+","+str(X)+")", ulam_sequence(n,X))
+    if fileName:
+        checkpointFile = fileName + '.ckpt'
+        binary_mode = 'b' if binary_encoding else ''
+        if resume and os.path.exists(checkpointFile):
+            file = open(fileName, 'r+' + binary_mode)
+        else:
+            if os.path.exists(fileName):
+                os.remove(fileName)
+            file = open(fileName, 'w+' + binary_mode)
+        if binary_encoding:
+            file = UlamBinaryWriter(file, n, X, known_lambdas.get((a, n), 0.0), binary_encoding, a=a)
+
+        if 1:
+            # print inside the method with addends
+            ulam_sequence(n, X, file, True, checkpointFile, a)
+        else:
+            for n in ulam_sequence(n,X):
+                file.write(str(n) + '\n')
+
+        file.close()
+
+    elif 0:
+        # do profiling
+        import cProfile
+        X = 1000*1000
+        print('ulam_sequence', n,X)
+        # cProfile.run('print(ulam_sequence(n,X))')
+        cProfile.run('ulam_sequence(n,X)')
     else:
-        for n in ulam_sequence(n,X):
-            file.write(str(n) + '\n')
-
-    file.close()
-
-elif 0:
-    # do profiling
-    import cProfile
-    X = 1000*1000
-    print('ulam_sequence', n,X)
-    # cProfile.run('print(ulam_sequence(n,X))')
-    cProfile.run('ulam_sequence(n,X)')
-else:
-    # just print to screen
-    print(ulam_sequence(n,X))
+        # just print to screen
+        print(ulam_sequence(n, X, a=a))
@@ -0,0 +1,211 @@
+# verify an Ulam sequence log written by ulam_sequence.py
+#
+# usage: py verify_ulam.py [--a=a] n X logFile [processes]
+#
+# The log is of U(a,n), a defaults to 1 as in ulam_sequence.py. Each line of a text log is either
+# "u addend" (the smaller addend of the unique sum) or just "u"; a binary file of ulam_io (written with --binary=)
+# is read with read_ulam_binary and must have a and n in its header.
+# Whether a candidate c is Ulam only depends on the terms below c, so if the logged terms are correct up to c,
+# the check at c is correct too. The first candidate where the check disagrees with the log is therefore
+# the first real error, and the candidate range can be split across processes that all read the same
+# terms and membership bitmap from shared memory.
+
+import sys, os, mmap
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from multiprocessing import Pool, shared_memory
+import ulam_io
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # the long tail of each scan is then tested in pure Python too
+
+numpy_min_slice = 64 # number of addends tested in pure Python before a scan is handed to NumPy
+shards_per_process = 32 # later shards are slower, many small shards keep every process busy
+
+# worker state, attached in init_worker
+shm_handles = None
+terms = None
+addends = None
+bits = None
+terms_np = None
+bits_np = None
+
+
+def is_binary_log(fileName):
+    ''' whether fileName starts with the magic of the binary format of ulam_io '''
+    with open(fileName, 'rb') as f:
+        return f.read(len(ulam_io.MAGIC)) == ulam_io.MAGIC
+
+def read_log(fileName, n, a = 1):
+    ''' returns the terms and claimed smaller addends (0 when not logged) of a log of U(a,n), a and n are added if missing '''
+    log_terms = array('q', [a, n])
+    log_addends = array('q', [0, 0])
+    if os.path.getsize(fileName) == 0:
+        return log_terms, log_addends
+
+    if is_binary_log(fileName):
+        header, terms, addends = ulam_io.read_ulam_binary(fileName)
+        if (header['a'], header['n']) != (a, n):
+            raise ValueError(fileName + " holds U(" + str(header['a']) + "," + str(header['n']) + "), not U(" + str(a) + "," + str(n) + ")")
+        keep = (terms != a) & (terms != n) # initial terms
+        log_terms.frombytes(np.ascontiguousarray(terms[keep], dtype=np.int64).tobytes())
+        log_addends.frombytes(np.ascontiguousarray(addends[keep], dtype=np.int64).tobytes())
+        return log_terms, log_addends
+
+    with open(fileName, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter(mm.readline, b''):
+            fields = line.split()
+            if not fields:
+                continue
+            u = int(fields[0])
+            if u == a or u == n:
+                continue # initial terms
+            log_terms.append(u)
+            log_addends.append(int(fields[1]) if len(fields) > 1 else 0)
+    return log_terms, log_addends
+
+
+def init_worker(terms_name, bits_name, num_terms):
+    ''' attaches the shared terms, addends and bitmap '''
+    global shm_handles, terms, addends, bits, terms_np, bits_np
+    shm_terms = shared_memory.SharedMemory(name=terms_name)
+    shm_bits = shared_memory.SharedMemory(name=bits_name)
+    shm_handles = (shm_terms, shm_bits) # keep the mappings alive
+    columns = shm_terms.buf.cast('q')
+    terms = columns[:num_terms]
+    addends = columns[num_terms:2 * num_terms]
+    bits = shm_bits.buf
+    if np is not None:
+        terms_np = np.frombuffer(shm_terms.buf, dtype=np.int64, count=num_terms)
+        bits_np = np.frombuffer(shm_bits.buf, dtype=np.uint8)
+
+
+def count_representations(c):
+    ''' returns the number of sums of two distinct terms equal to c (stopping at 2) and the smaller addend of the last one found '''
+    found_sum = 0
+    addend = 0
+    top = bisect_right(terms, c - 1) # terms smaller than c
+    for cur_u in islice(reversed(terms[:top]), numpy_min_slice):
+        other_u = c - cur_u
+        if other_u >= cur_u:
+            return found_sum, addend
+        if bits[other_u >> 3] >> (other_u & 7) & 1:
+            found_sum += 1
+            if found_sum > 1:
+                return found_sum, addend
+            addend = other_u
+
+    stop = max(top - numpy_min_slice, 0)
+    first = bisect_right(terms, c >> 1, 0, stop)
+    if first >= stop:
+        return found_sum, addend
+
+    if terms_np is not None:
+        tail = terms_np[first:stop]
+        others = c - tail
+        hits = others[(bits_np[others >> 3] >> (others & 7)) & 1 == 1]
+        found_sum += min(len(hits), 2)
+        if len(hits):
+            addend = int(hits[-1])
+        return min(found_sum, 2), addend
+
+    for i in range(stop - 1, first - 1, -1):
+        other_u = c - terms[i]
+        if bits[other_u >> 3] >> (other_u & 7) & 1:
+            found_sum += 1
+            if found_sum > 1:
+                return found_sum, addend
+            addend = other_u
+    return found_sum, addend
+
+
+def is_term(u):
+    ''' whether u is in the logged terms '''
+    return bits[u >> 3] >> (u & 7) & 1 == 1
+
+
+def verify_shard(shard):
+    ''' checks candidates lo..hi-1, returns the first mismatch as (c, kind, detail) or None '''
+    lo, hi, a, n = shard
+    for c in range(lo, hi):
+        if c == a or c == n:
+            continue
+        found_sum, addend = count_representations(c)
+        if is_term(c):
+            if found_sum == 0:
+                return c, 'extra term', 'no representation as a sum of two distinct terms'
+            if found_sum > 1:
+                return c, 'non-unique sum', 'at least two representations'
+            claimed = addends[bisect_right(terms, c) - 1]
+            if claimed and claimed != addend:
+                return c, 'wrong addend', 'logged ' + str(claimed) + ', unique sum is ' + str(addend) + ' + ' + str(c - addend)
+        elif found_sum == 1:
+            return c, 'missing term', 'unique sum ' + str(addend) + ' + ' + str(c - addend)
+    return None
+
+
+def verify(n, X, fileName, processes = None, a = 1):
+    ''' verifies the log of U(a,n) up to X, returns the first mismatch as (c, kind, detail) or None '''
+    log_terms, log_addends = read_log(fileName, n, a)
+
+    # terms must increase and stay below X before the bitmap can be built
+    for i in range(1, len(log_terms)):
+        if log_terms[i] > X:
+            return log_terms[i], 'extra term', 'larger than X'
+        if log_terms[i] <= log_terms[i - 1]:
+            return log_terms[i], 'extra term', 'logged after ' + str(log_terms[i - 1])
+
+    # terms and addends go into one shared block as two int64 columns
+    num_terms = len(log_terms)
+    shm_terms = shared_memory.SharedMemory(create=True, size=16 * num_terms)
+    shm_bits = shared_memory.SharedMemory(create=True, size=(X >> 3) + 1)
+    try:
+        shm_terms.buf[:8 * num_terms] = log_terms.tobytes()
+        shm_terms.buf[8 * num_terms:16 * num_terms] = log_addends.tobytes()
+        bitmap = bytearray(len(shm_bits.buf))
+        for u in log_terms:
+            bitmap[u >> 3] |= 1 << (u & 7)
+        shm_bits.buf[:len(bitmap)] = bitmap
+        del bitmap
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        with Pool(processes, initializer=init_worker, initargs=(shm_terms.name, shm_bits.name, num_terms)) as pool:
+            step = max(X // (processes * shards_per_process), 1)
+            shards = [(lo, min(lo + step, X + 1), a, n) for lo in range(1, X + 1, step)]
+
+            # shards come back in order, so the first mismatch found is the first one overall
+            for mismatch in pool.imap(verify_shard, shards):
+                if mismatch is not None:
+                    pool.terminate()
+                    return mismatch
+        return None
+    finally:
+        shm_terms.close()
+        shm_terms.unlink()
+        shm_bits.close()
+        shm_bits.unlink()
+
+
+if __name__ == "__main__":
+    a = 1
+    for arg in sys.argv[1:]:
+        if arg.startswith('--a='):
+            sys.argv.remove(arg)
+            a = int(arg[len('--a='):])
+    n = int(sys.argv[1])
+    X = int(sys.argv[2])
+    fileName = sys.argv[3]
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    mismatch = verify(n, X, fileName, processes, a)
+    if mismatch is None:
+        print('verified', fileName, 'as U(' + str(a) + ',' + str(n) + ') up to', X)
+    else:
+        c, kind, detail = mismatch
+        print('first mismatch at', c, ':', kind, '-', detail)
+        sys.exit(1)